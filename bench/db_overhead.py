@@ -0,0 +1,59 @@
+"""Per-query overhead of db.conn(): connect-per-call (the old behaviour) vs pooled connections.
+
+Run from the repo root: python -m bench.db_overhead
+"""
+import os
+import sqlite3
+import tempfile
+import time
+from contextlib import contextmanager
+
+from src import db
+
+N = 5000
+
+
+@contextmanager
+def connect_per_call(db_path: str):
+    # The pre-pool db.conn(): a fresh connection plus three PRAGMAs on every call.
+    c = sqlite3.connect(db_path)
+    c.row_factory = sqlite3.Row
+    c.execute("PRAGMA journal_mode=WAL;")
+    c.execute("PRAGMA foreign_keys=ON;")
+    c.execute("PRAGMA busy_timeout=5000;")
+    try:
+        yield c
+        c.commit()
+    finally:
+        c.close()
+
+
+def per_call_seconds(fn, n: int) -> float:
+    started = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - started) / n
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        db.init(path)
+        with db.conn(path) as c:
+            c.execute("INSERT INTO problems(slug, title, difficulty) VALUES('two-sum', 'Two Sum', 'Easy')")
+
+        def lookup(manager):
+            with manager(path) as c:
+                c.execute("SELECT slug, title, difficulty FROM problems WHERE slug=?", ("two-sum",)).fetchone()
+
+        results = {}
+        for name, manager in (("connect-per-call", connect_per_call), ("pooled", db.conn)):
+            lookup(manager)
+            results[name] = per_call_seconds(lambda: lookup(manager), N)
+            print(f"{name:>16}: {results[name] * 1e6:8.1f} us/query")
+        print(f"{'speedup':>16}: {results['connect-per-call'] / results['pooled']:8.1f}x")
+        db.close_all()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""Cost of the completions -> problems join that completions.difficulty removes.
+
+Runs the same per-user and all-users counts twice on the synthetic dataset from bench.query_plans:
+once joined to problems on slug (the old queries), once off the denormalized difficulty column and
+its covering indexes.
+
+Run from the repo root: python -m bench.difficulty_join [--users N]
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from bench.query_plans import build_dataset
+from src import db
+from src.timeutil import week_window_cst
+
+QUERIES = {
+    "per-user lifetime": (
+        """
+        SELECT p.difficulty, COUNT(*) FROM completions co
+        JOIN problems p ON p.slug = co.slug
+        WHERE co.user_id=? AND co.is_deleted=0
+        GROUP BY p.difficulty
+        """,
+        """
+        SELECT difficulty, COUNT(*) FROM completions
+        WHERE user_id=? AND is_deleted=0
+        GROUP BY difficulty
+        """,
+    ),
+    "per-user 30 days": (
+        """
+        SELECT p.difficulty, COUNT(*) FROM completions co
+        JOIN problems p ON p.slug = co.slug
+        WHERE co.user_id=? AND co.is_deleted=0 AND co.solved_at_utc>=? AND co.solved_at_utc<?
+        GROUP BY p.difficulty
+        """,
+        """
+        SELECT difficulty, COUNT(*) FROM completions
+        WHERE user_id=? AND is_deleted=0 AND solved_at_utc>=? AND solved_at_utc<?
+        GROUP BY difficulty
+        """,
+    ),
+    "all users, one week": (
+        """
+        SELECT co.user_id, SUM(p.difficulty='Easy'), SUM(p.difficulty='Medium'), SUM(p.difficulty='Hard')
+        FROM completions co
+        JOIN problems p ON p.slug = co.slug
+        WHERE co.is_deleted=0 AND co.solved_at_utc>=? AND co.solved_at_utc<?
+        GROUP BY co.user_id
+        """,
+        """
+        SELECT user_id, SUM(difficulty=1), SUM(difficulty=2), SUM(difficulty=3)
+        FROM completions
+        WHERE is_deleted=0 AND solved_at_utc>=? AND solved_at_utc<?
+        GROUP BY user_id
+        """,
+    ),
+}
+
+
+# How each query is parameterised: per user, or once for the whole table.
+PER_USER = {
+    "per-user lifetime": lambda user_id, start, end: (user_id,),
+    "per-user 30 days": lambda user_id, start, end: (user_id, end - 30 * 86400, end),
+}
+
+
+def params_for(name: str, user_id: int, start: int, end: int) -> tuple:
+    if name in PER_USER:
+        return PER_USER[name](user_id, start, end)
+    return (start, end)
+
+
+def normalized(rows) -> list[tuple]:
+    # Difficulty codes back to names so both versions compare equal.
+    out = []
+    for row in rows:
+        row = tuple(row)
+        if len(row) == 2 and isinstance(row[0], int):
+            row = (("Easy", "Medium", "Hard")[row[0] - 1], row[1])
+        out.append(row)
+    return sorted(out)
+
+
+def run(c, name: str, sql: str, users: int, start: int, end: int) -> float:
+    started = time.perf_counter()
+    if name not in PER_USER:
+        for _ in range(20):
+            c.execute(sql, (start, end)).fetchall()
+        return (time.perf_counter() - started) / 20
+    for user_id in range(1, users + 1):
+        c.execute(sql, params_for(name, user_id, start, end)).fetchall()
+    return (time.perf_counter() - started) / users
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m bench.difficulty_join")
+    parser.add_argument("--users", type=int, default=5000)
+    args = parser.parse_args()
+
+    start, end = week_window_cst(datetime.now(timezone.utc))
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            db.init()
+            rows = build_dataset(args.users)
+            print(f"dataset: {args.users} users, {rows} completions")
+            with db.conn() as c:
+                for name, (joined, denormalized) in QUERIES.items():
+                    # Same answer either way; only the cost differs.
+                    params = params_for(name, 1, start, end)
+                    assert normalized(c.execute(joined, params)) == normalized(c.execute(denormalized, params)), name
+                    run(c, name, joined, 50, start, end)
+                    old = run(c, name, joined, args.users, start, end)
+                    new = run(c, name, denormalized, args.users, start, end)
+                    print(f"{name:>20}: join {old * 1e6:9.1f} us   column {new * 1e6:9.1f} us   {old / new:5.1f}x")
+        finally:
+            db.close_all()
+            os.chdir(cwd)
+
+
+if __name__ == "__main__":
+    main()
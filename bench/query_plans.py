@@ -0,0 +1,271 @@
+"""Query-plan regression check for every public db function.
+
+Loads a synthetic dataset into a temporary database and calls each public db function against it.
+For every statement a call runs, it records EXPLAIN QUERY PLAN, and it times each call. The script
+exits non-zero when a statement fully scans a table that is not allowlisted for that function. It
+also fails when a public db function has no entry below, so new queries get checked too.
+
+Run from the repo root: python -m bench.query_plans [--users N] [--verbose]
+"""
+import argparse
+import inspect
+import os
+import random
+import re
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from src import db
+from src.timeutil import week_window_cst
+
+# Full scans that are the point of the query, per function. Everything else must use an index.
+ALLOWED_SCANS = {
+    "init": {"completions", "memberships", "discord_channel_memberships"},  # first-run scoreboard/rollup build
+    "get_tracked_users": {"users"},  # every linked user
+    "get_last_activity": {"users"},  # every user
+    "get_all_problems": {"problems"},  # catalog load
+    "get_telegram_names": {"telegram_names"},  # name cache warm-up; the table is pruned and small
+    "get_all_telegram_chats": {"chats"},
+    "get_all_discord_channels": {"discord_channels"},
+    "upsert_problems": {"problems"},  # compares the whole catalog sweep against stored difficulties
+    "rebuild_daily_rollups": {"completions", "daily_rollups"},
+    "rebuild_scoreboards": {"memberships", "discord_channel_memberships", "chat_week_scores", "discord_channel_week_scores"},
+}
+# Schema lookups are tiny and always scan.
+ALWAYS_ALLOWED = {"sqlite_master"}
+# Pool management and in-memory state, not queries.
+SKIP = {"conn", "close_all", "score_generations"}
+
+_COMMENT = re.compile(r"--[^\n]*")
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+_ALIAS = re.compile(r"\b(?:FROM|JOIN|INTO|UPDATE)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?", re.IGNORECASE)
+_SCAN = re.compile(r"^SCAN (\w+)")
+_KEYWORDS = {"WHERE", "ON", "JOIN", "LEFT", "GROUP", "ORDER", "SET", "VALUES", "SELECT", "USING", "AS"}
+
+
+def build_dataset(users: int, seed: int = 7):
+    rng = random.Random(seed)
+    now = int(time.time())
+    chats = max(10, users // 20)
+    channels = max(5, users // 80)
+    slugs = [f"problem-{i}" for i in range(3000)]
+    with db.conn() as c:
+        difficulties = {slug: rng.choice(("Easy", "Medium", "Hard")) for slug in slugs}
+        c.executemany(
+            "INSERT INTO problems(slug, title, difficulty) VALUES(?, ?, ?)",
+            [(slug, slug.title(), difficulty) for slug, difficulty in difficulties.items()],
+        )
+        c.executemany(
+            "INSERT INTO users(id, lc_username, created_at) VALUES(?, ?, ?)",
+            [(i, f"lc{i}", now - 400 * 86400) for i in range(1, users + 1)],
+        )
+        c.executemany(
+            "INSERT INTO last_seen(lc_username, last_seen_ts) VALUES(?, ?)",
+            [(f"lc{i}", now) for i in range(1, users + 1)],
+        )
+        c.executemany(
+            "INSERT INTO telegram_links(telegram_user_id, user_id, tg_username) VALUES(?, ?, ?)",
+            [(100000 + i, i, f"tg{i}") for i in range(1, users + 1) if i % 5],
+        )
+        c.executemany(
+            "INSERT INTO discord_links(discord_user_id, user_id, discord_username) VALUES(?, ?, ?)",
+            [(f"d{i}", i, f"dc{i}") for i in range(1, users + 1) if i % 5 in (0, 1)],
+        )
+        c.executemany("INSERT INTO chats(chat_id, title) VALUES(?, ?)", [(-i, f"chat {i}") for i in range(1, chats + 1)])
+        c.executemany(
+            "INSERT INTO discord_channels(guild_id, channel_id) VALUES(?, ?)",
+            [("g1", f"c{i}") for i in range(1, channels + 1)],
+        )
+        c.executemany(
+            "INSERT OR IGNORE INTO memberships(chat_id, user_id) VALUES(?, ?)",
+            [(-rng.randint(1, chats), i) for i in range(1, users + 1) if i % 5 for _ in range(rng.randint(1, 3))],
+        )
+        c.executemany(
+            "INSERT OR IGNORE INTO discord_channel_memberships(guild_id, channel_id, user_id) VALUES(?, ?, ?)",
+            [("g1", f"c{rng.randint(1, channels)}", i) for i in range(1, users + 1) if i % 5 in (0, 1)],
+        )
+        c.executemany(
+            "INSERT INTO telegram_names(chat_id, telegram_user_id, display_name, resolved_at) VALUES(?, ?, ?, ?)",
+            [(-rng.randint(1, chats), 100000 + i, f"@tg{i}", now - rng.randint(0, 60 * 86400)) for i in range(1, users + 1)],
+        )
+        completions = []
+        for i in range(1, users + 1):
+            for slug in rng.sample(slugs, rng.randint(5, 80)):
+                completions.append((i, slug, now - rng.randint(0, 365 * 86400), db.DIFFICULTY_CODES[difficulties[slug]]))
+        c.executemany(
+            "INSERT INTO completions(user_id, slug, solved_at_utc, is_deleted, difficulty) VALUES(?, ?, ?, 0, ?)",
+            completions,
+        )
+    db.rebuild_scoreboards()
+    db.rebuild_daily_rollups()
+    return len(completions)
+
+
+def all_chat_weights():
+    return {row["chat_id"]: (1, 2, 5) for row in db.get_all_telegram_chats()}
+
+
+def all_channel_weights():
+    return {(row["guild_id"], row["channel_id"]): (1, 2, 5) for row in db.get_all_discord_channels()}
+
+
+def calls(chat_weights=None, channel_weights=None):
+    # (function name, label, thunk). Reads first; writes last, ending with the unlinks.
+    now = int(time.time())
+    start, end = week_window_cst(datetime.now(timezone.utc))
+    submission = {"slug": "problem-1", "title": "Problem-1", "difficulty": "Easy", "solved_at_utc": now}
+    return [
+        ("get_user_by_id", "", lambda: db.get_user_by_id(1)),
+        ("get_user_by_lc", "", lambda: db.get_user_by_lc("lc1")),
+        ("get_user_by_telegram_id", "", lambda: db.get_user_by_telegram_id(100001)),
+        ("get_user_by_discord_id", "", lambda: db.get_user_by_discord_id("d1")),
+        ("get_telegram_link_for_user", "", lambda: db.get_telegram_link_for_user(1)),
+        ("get_discord_link_for_user", "", lambda: db.get_discord_link_for_user(1)),
+        ("get_any_platform_identity", "", lambda: db.get_any_platform_identity(1)),
+        ("get_identities", "", lambda: db.get_identities(range(1, 11))),
+        ("get_telegram_names", "", lambda: db.get_telegram_names(5000)),
+        ("get_tracked_users", "", db.get_tracked_users),
+        ("get_last_activity", "", db.get_last_activity),
+        ("get_user_chats", "", lambda: db.get_user_chats(1)),
+        ("get_user_discord_channels", "", lambda: db.get_user_discord_channels(1)),
+        ("get_all_telegram_chats", "", db.get_all_telegram_chats),
+        ("get_all_discord_channels", "", db.get_all_discord_channels),
+        ("get_chat_scoring", "", lambda: db.get_chat_scoring(-1)),
+        ("get_discord_channel_scoring", "", lambda: db.get_discord_channel_scoring("g1", "c1")),
+        ("get_all_problems", "", db.get_all_problems),
+        ("get_problem", "", lambda: db.get_problem("problem-1")),
+        ("has_active_completion", "", lambda: db.has_active_completion(1, "problem-1")),
+        ("get_user_counts", "lifetime", lambda: db.get_user_counts(1)),
+        ("get_user_counts", "week", lambda: db.get_user_counts(1, start, end)),
+        ("ranked_weekly", "week", lambda: db.ranked_weekly(-1, start, end, (1, 2, 5), 10)),
+        ("ranked_weekly", "range", lambda: db.ranked_weekly(-1, start - 3600, end, (1, 2, 5), 10)),
+        ("ranked_weekly_discord", "week", lambda: db.ranked_weekly_discord("g1", "c1", start, end, (1, 2, 5), 10)),
+        ("ranked_weekly_discord", "range", lambda: db.ranked_weekly_discord("g1", "c1", start - 3600, end, (1, 2, 5), 10)),
+        ("ranked_weekly_by_chat", "week", lambda: db.ranked_weekly_by_chat(start, end, chat_weights, 10)),
+        ("ranked_weekly_by_chat", "range", lambda: db.ranked_weekly_by_chat(start - 3600, end, chat_weights, 10)),
+        ("ranked_weekly_by_discord_channel", "week", lambda: db.ranked_weekly_by_discord_channel(start, end, channel_weights, 10)),
+        ("ranked_weekly_by_discord_channel", "range", lambda: db.ranked_weekly_by_discord_channel(start - 3600, end, channel_weights, 10)),
+        ("get_or_set_last_seen", "read", lambda: db.get_or_set_last_seen("lc1")),
+        ("get_or_set_last_seen", "write", lambda: db.get_or_set_last_seen("lc1", now)),
+        ("ensure_last_seen", "", lambda: db.ensure_last_seen("lc1", now)),
+        ("get_or_create_user", "", lambda: db.get_or_create_user("bench-new-user")),
+        ("upsert_problem", "", lambda: db.upsert_problem("problem-new", "Problem New", "Hard")),
+        ("upsert_problems", "", lambda: db.upsert_problems([{"slug": "problem-2", "title": "P2", "difficulty": "Hard"}])),
+        ("insert_completion", "", lambda: db.insert_completion(2, "problem-new", now)),
+        ("ingest_submissions", "", lambda: db.ingest_submissions(3, "lc3", [submission], start, end)),
+        ("save_telegram_name", "", lambda: db.save_telegram_name(-1, 100001, "@tg1", now)),
+        ("prune_telegram_names", "", lambda: db.prune_telegram_names(now - 30 * 86400)),
+        ("plan_scheduled_posts", "", lambda: db.plan_scheduled_posts("weekly_champion", start, ["tg:-1", "dc:g1:c1"])),
+        ("set_scheduled_post_status", "", lambda: db.set_scheduled_post_status("weekly_champion", start, "tg:-1", "sent")),
+        ("get_interrupted_runs", "", lambda: db.get_interrupted_runs(start - 86400)),
+        ("prune_scheduled_posts", "", lambda: db.prune_scheduled_posts("weekly_champion", start - 35 * 86400)),
+        ("set_chat", "", lambda: db.set_chat(-1, "chat 1", post_on_solve=1, scoring="1,2,5")),
+        ("set_discord_channel", "", lambda: db.set_discord_channel("g1", "c1", post_on_solve=1, scoring="1,2,5")),
+        ("join_chat", "", lambda: db.join_chat(-2, 100004)),
+        ("leave_chat", "", lambda: db.leave_chat(-2, 100004)),
+        ("join_discord_channel", "", lambda: db.join_discord_channel("g1", "c2", "d5")),
+        ("leave_discord_channel", "", lambda: db.leave_discord_channel("g1", "c2", "d5")),
+        ("link_telegram_account", "", lambda: db.link_telegram_account(999999, "newbie", "lc-newbie")),
+        ("relink_telegram_account", "", lambda: db.relink_telegram_account(999998, "other", "lc-newbie")),
+        ("link_discord_account", "", lambda: db.link_discord_account("dnew", "newbie", "lc-newbie")),
+        ("relink_discord_account", "", lambda: db.relink_discord_account("dother", "other", "lc-newbie")),
+        ("unlink_discord_account", "", lambda: db.unlink_discord_account("d6")),
+        ("unlink_telegram_account", "", lambda: db.unlink_telegram_account(100006)),
+        ("rebuild_scoreboards", "", db.rebuild_scoreboards),
+        ("rebuild_daily_rollups", "", db.rebuild_daily_rollups),
+        ("init", "", db.init),
+    ]
+
+
+def full_scans(plan, sql: str, tables: set[str]) -> set[str]:
+    aliases = {}
+    for table, alias in _ALIAS.findall(sql):
+        aliases[table] = table
+        if alias and alias.upper() not in _KEYWORDS:
+            aliases[alias] = table
+    scans = set()
+    for row in plan:
+        match = _SCAN.match(row[3])
+        if match and aliases.get(match.group(1), match.group(1)) in tables:
+            scans.add(aliases.get(match.group(1), match.group(1)))
+    return scans
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m bench.query_plans")
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--verbose", action="store_true", help="print every captured plan")
+    args = parser.parse_args()
+
+    public = {
+        name
+        for name, fn in inspect.getmembers(db, inspect.isfunction)
+        if fn.__module__ == db.__name__ and not name.startswith("_")
+    } - SKIP
+    covered = {name for name, _, _ in calls()}
+    failures = [f"{name}: no entry in bench.query_plans.calls()" for name in sorted(public - covered)]
+
+    statements: list[str] = []
+    connect = db._connect
+
+    def traced_connect(path):
+        c = connect(path)
+        c.set_trace_callback(statements.append)
+        return c
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        db._connect = traced_connect
+        try:
+            db.init()
+            started = time.perf_counter()
+            rows = build_dataset(args.users)
+            print(f"dataset: {args.users} users, {rows} completions in {time.perf_counter() - started:.1f}s")
+            explain = sqlite3.connect("bot.db")
+            tables = {row[0] for row in explain.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+            tables -= ALWAYS_ALLOWED
+
+            for name, label, thunk in calls(all_chat_weights(), all_channel_weights()):
+                statements.clear()
+                started = time.perf_counter()
+                thunk()
+                elapsed = time.perf_counter() - started
+                seen = {}
+                for sql in statements:
+                    words = _COMMENT.sub("", sql).split(None, 1)
+                    if words and words[0].upper() in ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH"):
+                        seen.setdefault(_LITERAL.sub("?", sql), sql)
+                scans = set()
+                for sql in seen.values():
+                    plan = explain.execute(f"EXPLAIN QUERY PLAN {sql}").fetchall()
+                    scans |= full_scans(plan, sql, tables)
+                    if args.verbose:
+                        print(f"  {' '.join(sql.split())[:110]}")
+                        for row in plan:
+                            print(f"    {row[3]}")
+                bad = scans - ALLOWED_SCANS.get(name, set())
+                tag = f"{name}[{label}]" if label else name
+                status = "FULL SCAN " + ",".join(sorted(bad)) if bad else "ok"
+                print(f"{tag:<42} {elapsed * 1000:9.2f} ms  {len(seen):3d} stmt  {status}")
+                if bad:
+                    failures.append(f"{tag}: full scan of {', '.join(sorted(bad))}")
+            explain.close()
+        finally:
+            db._connect = connect
+            db.close_all()
+            os.chdir(cwd)
+
+    if failures:
+        print("\nFAILED:")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+    print("\nall query plans use indexes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+import asyncio
+import time
+from collections import deque
+
+from .config import ANNOUNCE_PER_DESTINATION, ANNOUNCE_QUEUE_SIZE, ANNOUNCE_WORKERS
+
+# Bounded in-process queue between the poller and the chat platforms. The poller publishes and moves
+# on; dispatcher workers do the sends, so a slow Telegram or Discord call never stalls polling.
+# Events wait in a FIFO lane per destination, and workers only take a destination that is below its
+# ANNOUNCE_PER_DESTINATION limit, so a backlog in one chat never ties up workers other chats need.
+class _Lane:
+    __slots__ = ("events", "queued", "sending")
+
+    def __init__(self):
+        self.events = deque()
+        # Turns handed to _ready but not picked up yet, and sends in flight.
+        self.queued = 0
+        self.sending = 0
+
+
+_lanes: dict[tuple, _Lane] = {}
+# Destinations with an event a worker may send now, once per turn.
+_ready: asyncio.Queue | None = None
+_workers: list[asyncio.Task] = []
+_depth = 0
+_stats = {
+    "published": 0,
+    "sent": 0,
+    "failed": 0,
+    "dropped": 0,
+    "send_seconds": 0.0,
+    "max_send_seconds": 0.0,
+}
+
+
+def _schedule(destination: tuple, lane: _Lane):
+    while lane.queued < len(lane.events) and lane.queued + lane.sending < max(1, ANNOUNCE_PER_DESTINATION):
+        lane.queued += 1
+        _ready.put_nowait(destination)
+
+
+def publish(destination: tuple, send, *args) -> bool:
+    # `send(*args)` is awaited later by a dispatcher and should return True once the message went out.
+    global _depth
+    if _ready is None:
+        print(f"[announce] dispatcher not running, dropping event destination={destination}")
+        _stats["dropped"] += 1
+        return False
+    if _depth >= ANNOUNCE_QUEUE_SIZE:
+        _stats["dropped"] += 1
+        print(f"[announce] queue full, dropping event destination={destination} dropped={_stats['dropped']}")
+        return False
+    lane = _lanes.get(destination)
+    if lane is None:
+        lane = _lanes[destination] = _Lane()
+    lane.events.append((send, args))
+    _depth += 1
+    _stats["published"] += 1
+    _schedule(destination, lane)
+    return True
+
+
+async def _dispatch():
+    global _depth
+    while True:
+        destination = await _ready.get()
+        lane = _lanes[destination]
+        lane.queued -= 1
+        send, args = lane.events.popleft()
+        _depth -= 1
+        lane.sending += 1
+        started = time.monotonic()
+        try:
+            ok = await send(*args)
+        except Exception as exc:
+            ok = False
+            print(f"[announce] send raised destination={destination} exc={exc}")
+        finally:
+            lane.sending -= 1
+        elapsed = time.monotonic() - started
+        if lane.events:
+            _schedule(destination, lane)
+        elif not lane.sending and not lane.queued:
+            # Idle destinations are forgotten, so the lane map only holds chats with work.
+            del _lanes[destination]
+        _stats["sent" if ok else "failed"] += 1
+        _stats["send_seconds"] += elapsed
+        _stats["max_send_seconds"] = max(_stats["max_send_seconds"], elapsed)
+
+
+def start():
+    global _ready
+    if _ready is not None:
+        return
+    _ready = asyncio.Queue()
+    for i in range(max(1, ANNOUNCE_WORKERS)):
+        _workers.append(asyncio.create_task(_dispatch(), name=f"announce-worker-{i}"))
+
+
+async def stop():
+    global _ready, _depth
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
+    _lanes.clear()
+    _ready = None
+    _depth = 0
+
+
+def status() -> dict:
+    done = _stats["sent"] + _stats["failed"]
+    return {
+        "depth": _depth,
+        "destinations": len(_lanes),
+        "published": _stats["published"],
+        "sent": _stats["sent"],
+        "failed": _stats["failed"],
+        "dropped": _stats["dropped"],
+        "avg_send_seconds": _stats["send_seconds"] / done if done else 0.0,
+        "max_send_seconds": _stats["max_send_seconds"],
+    }
@@ -1,3 +1,4 @@
+import asyncio
 import html
 import time
 from datetime import datetime, timezone
@@ -5,68 +6,49 @@ from datetime import datetime, timezone
 from aiogram import Bot, Dispatcher, types
 from aiogram.filters import Command
 
-from . import db
+from . import announcer, db_async, discord_outbox, leetcode, namecache, telegram_outbox
 from .commands import router as cmd_router
-from .config import BOT_TOKEN
-from .leaderboard import rank_rows
-from .leetcode import LCClient
+from .config import BOT_TOKEN, NAME_RESOLVE_CONCURRENCY
+from .leaderboard import LEADERBOARD_SIZE, standings
 from .scoring import parse_weights
 from .timeutil import week_window_cst
 
 bot = Bot(BOT_TOKEN)
+bot.session.middleware(telegram_outbox.OutboxMiddleware())
 dp = Dispatcher()
 dp.include_router(cmd_router)
-lc = LCClient()
+# Caps concurrent name lookups across renders; each cache miss is a get_chat_member call.
+_name_lookups = asyncio.Semaphore(max(1, NAME_RESOLVE_CONCURRENCY))
 
 
 async def start_telegram():
     await dp.start_polling(bot)
 
 
-async def resolve_telegram_name(chat_id: int, user_id: int) -> str:
-    link = db.get_telegram_link_for_user(user_id)
-    identity = db.get_any_platform_identity(user_id)
-    lc_username = identity["lc_username"] if identity else str(user_id)
+async def _fetch_telegram_name(chat_id: int, telegram_user_id: int) -> str:
+    member = await bot.get_chat_member(chat_id, telegram_user_id)
+    if member.user.username:
+        return f"@{member.user.username}"
+    return member.user.full_name or ""
 
-    if not link:
-        return html.escape(lc_username)
 
-    tg_id = link["telegram_user_id"]
-    tg_username = link["tg_username"] or ""
-    try:
-        member = await bot.get_chat_member(chat_id, tg_id)
-        username = member.user.username
-        if username:
-            return html.escape(f"@{username}")
-        full_name = member.user.full_name or lc_username
-        return html.escape(full_name)
-    except Exception as exc:
-        print(
-            f"[Error] telegram get_chat_member failed chat_id={chat_id} "
-            f"user_id={user_id} telegram_user_id={tg_id} exc={exc}"
-        )
-        if tg_username:
-            return html.escape(f"@{tg_username}")
-        return html.escape(lc_username)
+async def resolve_telegram_name(chat_id: int, user_id: int) -> str:
+    name, _ = await resolve_telegram_name_with_hint(chat_id, user_id)
+    return name
 
 
-async def resolve_telegram_name_with_hint(chat_id: int, user_id: int) -> tuple[str, str | None]:
-    link = db.get_telegram_link_for_user(user_id)
-    identity = db.get_any_platform_identity(user_id)
+async def _telegram_name_for(chat_id: int, user_id: int, identity) -> tuple[str, str | None]:
+    # `identity` is a get_any_platform_identity() / get_identities() row, or None.
     lc_username = identity["lc_username"] if identity else str(user_id)
 
-    if not link:
+    if not identity or identity["telegram_user_id"] is None:
         return html.escape(lc_username), None
 
-    tg_id = link["telegram_user_id"]
-    tg_username = link["tg_username"] or ""
+    tg_id = identity["telegram_user_id"]
+    tg_username = identity["tg_username"] or ""
     try:
-        member = await bot.get_chat_member(chat_id, tg_id)
-        username = member.user.username
-        if username:
-            return html.escape(f"@{username}"), None
-        full_name = member.user.full_name or lc_username
-        return html.escape(full_name), None
+        name = await namecache.telegram_name(chat_id, tg_id, _fetch_telegram_name)
+        return html.escape(name or lc_username), None
     except Exception as exc:
         print(
             f"[Error] telegram get_chat_member failed chat_id={chat_id} "
@@ -76,6 +58,23 @@ async def resolve_telegram_name_with_hint(chat_id: int, user_id: int) -> tuple[s
         return fallback, lc_username
 
 
+async def resolve_telegram_name_with_hint(chat_id: int, user_id: int) -> tuple[str, str | None]:
+    identity = await db_async.get_any_platform_identity(user_id)
+    return await _telegram_name_for(chat_id, user_id, identity)
+
+
+async def resolve_telegram_names(chat_id: int, user_ids) -> dict[int, tuple[str, str | None]]:
+    # One identity read for everyone, then each user's name concurrently: user_id -> (name, relink_hint).
+    unique = list(dict.fromkeys(user_ids))
+    identities = await db_async.get_identities(unique)
+
+    async def resolve(user_id: int):
+        async with _name_lookups:
+            return await _telegram_name_for(chat_id, user_id, identities.get(user_id))
+
+    return dict(zip(unique, await asyncio.gather(*(resolve(user_id) for user_id in unique))))
+
+
 async def send_telegram_solve_announcement(
     chat_id: int,
     user_id: int,
@@ -83,7 +82,7 @@ async def send_telegram_solve_announcement(
     difficulty: str,
     total: int,
     counts: dict[str, int],
-):
+) -> bool:
     name = await resolve_telegram_name(chat_id, user_id)
     msg = (
         f"{name} solved <b>{html.escape(title)}</b> (<i>{html.escape(difficulty)}</i>).\n"
@@ -91,30 +90,33 @@ async def send_telegram_solve_announcement(
         f"E:{counts.get('Easy', 0)} M:{counts.get('Medium', 0)} H:{counts.get('Hard', 0)}"
     )
     try:
-        await bot.send_message(
-            chat_id,
-            msg,
-            parse_mode="HTML",
-            disable_web_page_preview=True,
-        )
+        with telegram_outbox.priority(telegram_outbox.ANNOUNCE):
+            await bot.send_message(
+                chat_id,
+                msg,
+                parse_mode="HTML",
+                disable_web_page_preview=True,
+            )
     except Exception as exc:
         print(f"[Error] telegram send_message failed chat_id={chat_id} exc={exc}")
+        return False
+    return True
 
 
-async def _telegram_rank_lines(chat_id: int, scored) -> list[str]:
+async def _telegram_rank_lines(chat_id: int, scored, names=None) -> list[str]:
+    # `scored` is already cut to the top places plus ties, so tied entries share a rank.
+    if names is None:
+        names = await resolve_telegram_names(chat_id, [entry.user_id for entry in scored])
     lines = []
     relink_hints = []
-    rank = 1
-    for entry in scored[:10]:
-        name, relink_hint = await resolve_telegram_name_with_hint(chat_id, entry["user_id"])
-        counts = entry["counts"]
+    for entry in scored:
+        name, relink_hint = names[entry.user_id]
         lines.append(
-            f"{rank}. {name} - <b>{entry['total']}</b> "
-            f"(E:{counts['Easy']} M:{counts['Medium']} H:{counts['Hard']})"
+            f"{entry.rank}. {name} - <b>{entry.total}</b> "
+            f"(E:{entry.easy} M:{entry.medium} H:{entry.hard})"
         )
         if relink_hint:
             relink_hints.append(relink_hint)
-        rank += 1
     if relink_hints:
         unique_hints = []
         for hint in relink_hints:
@@ -129,41 +131,48 @@ async def _telegram_rank_lines(chat_id: int, scored) -> list[str]:
     return lines
 
 
-async def post_telegram_leaderboard(chat_id: int, scoring: str, scored, header: str):
+async def post_telegram_leaderboard(chat_id: int, scoring: str, scored, header: str) -> bool:
     if not scored:
-        return
+        return False
     e, m, h = parse_weights(scoring)
     lines = [f"🏆 <b>{html.escape(header)}</b>\nPoint allocation: (E={e}, M={m}, H={h})\n"]
     lines.extend(await _telegram_rank_lines(chat_id, scored))
     try:
-        await bot.send_message(chat_id, "\n".join(lines), parse_mode="HTML")
+        with telegram_outbox.priority(telegram_outbox.BULK):
+            await bot.send_message(chat_id, "\n".join(lines), parse_mode="HTML")
     except Exception as exc:
         print(f"[Error] telegram leaderboard send failed chat_id={chat_id} exc={exc}")
+        return False
+    return True
 
 
-async def post_telegram_champion(chat_id: int, scored):
+async def post_telegram_champion(chat_id: int, scored, names=None) -> bool:
     if not scored:
-        return
-    top_total = scored[0]["total"]
-    winners = [entry for entry in scored if entry["total"] == top_total]
-    winner_names = [await resolve_telegram_name(chat_id, entry["user_id"]) for entry in winners]
+        return False
+    top_total = scored[0].total
+    if names is None:
+        names = await resolve_telegram_names(chat_id, [entry.user_id for entry in scored])
+    winner_names = [names[entry.user_id][0] for entry in scored if entry.total == top_total]
     lines = [f"👑 <b>Weekly Champion</b> - {' & '.join(winner_names)} (score <b>{top_total}</b>)\n"]
     lines.append("<i>Final standings</i>")
-    lines.extend(await _telegram_rank_lines(chat_id, scored))
+    lines.extend(await _telegram_rank_lines(chat_id, scored, names))
     try:
-        await bot.send_message(chat_id, "\n".join(lines), parse_mode="HTML")
+        with telegram_outbox.priority(telegram_outbox.BULK):
+            await bot.send_message(chat_id, "\n".join(lines), parse_mode="HTML")
     except Exception as exc:
         print(f"[Error] telegram champion send failed chat_id={chat_id} exc={exc}")
+        return False
+    return True
 
 
 @dp.message(Command("leaderboard"))
 async def leaderboard(m: types.Message):
     chat_id = m.chat.id
-    db.set_chat(chat_id, m.chat.title or "")
-    scoring = db.get_chat_scoring(chat_id) or "1,2,5"
+    await db_async.set_chat(chat_id, m.chat.title or "")
+    scoring = await db_async.get_chat_scoring(chat_id) or "1,2,5"
     start, end = week_window_cst(datetime.now(timezone.utc))
-    rows = db.weekly_counts(chat_id, start, end)
-    scored, weights = rank_rows(rows, scoring)
+    weights = parse_weights(scoring)
+    scored = standings(await db_async.ranked_weekly(chat_id, start, end, weights, LEADERBOARD_SIZE))
     if not scored:
         return await m.reply("No solves yet this week.")
 
@@ -175,13 +184,13 @@ async def leaderboard(m: types.Message):
 
 @dp.message(Command("stats"))
 async def stats(m: types.Message):
-    user = db.get_user_by_telegram_id(m.from_user.id)
+    user = await db_async.get_user_by_telegram_id(m.from_user.id)
     if not user:
         return await m.reply("Link first with /link leetcode_username.")
 
     start, end = week_window_cst(datetime.now(timezone.utc))
-    total = db.get_user_counts(user["user_id"])
-    week = db.get_user_counts(user["user_id"], start, end)
+    total = await db_async.get_user_counts(user["user_id"])
+    week = await db_async.get_user_counts(user["user_id"], start, end)
     await m.reply(
         f"Lifetime - E:{total.get('Easy', 0)} M:{total.get('Medium', 0)} H:{total.get('Hard', 0)}\n"
         f"This week - E:{week.get('Easy', 0)} M:{week.get('Medium', 0)} H:{week.get('Hard', 0)}"
@@ -197,17 +206,17 @@ async def debug_me(m: types.Message):
     current_tg_un = m.from_user.username or ""
 
     if lcname:
-        user = db.get_user_by_lc(lcname)
+        user = await db_async.get_user_by_lc(lcname)
         if not user:
             return await m.reply(f"No user linked to LC '{lcname}'.")
     else:
-        user = db.get_user_by_telegram_id(current_tg_id)
+        user = await db_async.get_user_by_telegram_id(current_tg_id)
         if not user:
             return await m.reply("No mapping found. Link first with /link leetcode_username.")
-        user = db.get_user_by_id(user["user_id"])
+        user = await db_async.get_user_by_id(user["user_id"])
 
-    link = db.get_telegram_link_for_user(user["id"])
-    ls = db.get_or_set_last_seen(user["lc_username"]) or 0
+    link = await db_async.get_telegram_link_for_user(user["id"])
+    ls = await db_async.get_or_set_last_seen(user["lc_username"]) or 0
     ls_h = time.strftime("%Y-%m-%d %H:%M:%S UTC", time.gmtime(ls)) if ls else "0"
 
     stored_tg_id = link["telegram_user_id"] if link else None
@@ -233,17 +242,17 @@ async def debug_recent(m: types.Message):
     parts = (m.text or "").split()
     lcname = parts[1] if len(parts) > 1 else None
     if not lcname:
-        user = db.get_user_by_telegram_id(m.from_user.id)
+        user = await db_async.get_user_by_telegram_id(m.from_user.id)
         if not user:
             return await m.reply("Link first with /link leetcode_username or pass a username: /debug_recent foo")
         lcname = user["lc_username"]
 
-    target = db.get_user_by_lc(lcname)
+    target = await db_async.get_user_by_lc(lcname)
     if not target:
         return await m.reply(f"No user linked to LC '{lcname}'.")
 
-    cutoff = db.get_or_set_last_seen(lcname) or 0
-    subs = await lc.recent_ac(lcname, limit=20)
+    cutoff = await db_async.get_or_set_last_seen(lcname) or 0
+    subs = await leetcode.get_client().recent_ac(lcname, limit=20)
     subs.sort(key=lambda s: int(s["timestamp"]))
     lines = [f"cutoff last_seen={cutoff}"]
     shown = 0
@@ -251,14 +260,7 @@ async def debug_recent(m: types.Message):
         ts = int(submission["timestamp"])
         slug = submission["titleSlug"]
         title = submission["title"]
-        with db.conn() as c:
-            seen = c.execute(
-                """
-                SELECT 1 FROM completions
-                WHERE user_id=? AND slug=? AND is_deleted=0
-                """,
-                (target["id"], slug),
-            ).fetchone()
+        seen = await db_async.has_active_completion(target["id"], slug)
         status = ["new" if ts > cutoff else "old", "dup" if seen else "first?"]
         lines.append(f"{ts}  {title}  [{slug}]  -> {'/'.join(status)}")
         shown += 1
@@ -275,14 +277,14 @@ async def debug_lc(m: types.Message):
         return await m.reply("Usage: /debug_lc leetcode_username")
     lcname = parts[1].strip()
 
-    user = db.get_user_by_lc(lcname)
+    user = await db_async.get_user_by_lc(lcname)
     if not user:
         return await m.reply(f"No user linked to LC '{lcname}'.")
 
-    link = db.get_telegram_link_for_user(user["id"])
+    link = await db_async.get_telegram_link_for_user(user["id"])
     tg_id = link["telegram_user_id"] if link else None
     tg_un = link["tg_username"] if link else ""
-    ls = db.get_or_set_last_seen(lcname) or 0
+    ls = await db_async.get_or_set_last_seen(lcname) or 0
     ls_h = time.strftime("%Y-%m-%d %H:%M:%S UTC", time.gmtime(ls)) if ls else "0"
 
     chat_id = m.chat.id
@@ -311,3 +313,45 @@ async def debug_lc(m: types.Message):
         lines.append(f"get_chat_member error: {gm_error}")
 
     await m.reply("\n".join(lines))
+
+
+@dp.message(Command("debug_status"))
+async def debug_status(m: types.Message):
+    lc_status = leetcode.status()
+    breaker = lc_status["breaker"]
+    state = breaker["state"]
+    if state == "open":
+        state += f" ({breaker['open_for']:.0f}s left)"
+    lines = [
+        f"LeetCode circuit: {state}",
+        f"Recent failures: {breaker['failures']}/{breaker['window']} (trips: {breaker['trips']})",
+        f"Last error: {breaker['last_error'] or '(none)'}",
+        f"Rate limit: {lc_status['rps']:g} req/s, tokens: {lc_status['tokens']:.1f}",
+        f"Retries: {lc_status['retries']}",
+    ]
+    queue = announcer.status()
+    lines.extend(
+        [
+            f"Announce queue: depth {queue['depth']}, sent {queue['sent']}, "
+            f"failed {queue['failed']}, dropped {queue['dropped']}",
+            f"Announce send latency: avg {queue['avg_send_seconds']:.2f}s, "
+            f"max {queue['max_send_seconds']:.2f}s",
+        ]
+    )
+    outbox = telegram_outbox.status()
+    lines.append(
+        f"Telegram outbox: waiting {outbox['waiting']}, sent {outbox['admitted']}, "
+        f"retry_after {outbox['retry_after']}, gave up {outbox['gave_up']}"
+    )
+    discord_queue = discord_outbox.status()
+    lines.append(
+        f"Discord outbox: {discord_queue['lanes']} channels, waiting {discord_queue['waiting']}, "
+        f"sent {discord_queue['sent']}, failed {discord_queue['failed']}, "
+        f"unavailable channels {discord_queue['missing']}"
+    )
+    names = namecache.status()
+    lines.append(
+        f"Name cache: {names['size']} names, hits {names['hits']}, stale {names['stale']}, "
+        f"misses {names['misses']}, refresh failures {names['refresh_failed']}"
+    )
+    await m.reply("\n".join(lines))
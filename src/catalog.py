@@ -0,0 +1,39 @@
+import time
+
+from . import db, db_async
+
+# slug -> {"title", "difficulty"}; the poller checks this before SQLite or LeetCode.
+_PROBLEMS: dict[str, dict[str, str]] = {}
+
+
+def load() -> int:
+    for row in db.get_all_problems():
+        _PROBLEMS[row["slug"]] = {"title": row["title"], "difficulty": row["difficulty"]}
+    return len(_PROBLEMS)
+
+
+async def refresh(lc) -> int:
+    # One paginated sweep of the LeetCode problem list, persisted and mirrored in memory.
+    started = time.monotonic()
+    problems = await lc.problem_catalog()
+    await db_async.upsert_problems(problems)
+    for problem in problems:
+        _PROBLEMS[problem["slug"]] = {"title": problem["title"], "difficulty": problem["difficulty"]}
+    print(f"[catalog] refreshed {len(problems)} problems in {time.monotonic() - started:.1f}s")
+    return len(problems)
+
+
+async def problem_meta(lc, slug: str) -> dict[str, str]:
+    meta = _PROBLEMS.get(slug)
+    if meta is not None:
+        return meta
+
+    row = await db_async.get_problem(slug)
+    if row:
+        meta = {"title": row["title"], "difficulty": row["difficulty"]}
+    else:
+        # Only problems published since the last sweep should get here.
+        meta = await lc.problem_meta(slug)
+        await db_async.upsert_problem(slug, meta["title"], meta["difficulty"])
+    _PROBLEMS[slug] = meta
+    return meta
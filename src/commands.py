@@ -4,7 +4,7 @@ import sqlite3
 from aiogram import Router, types
 from aiogram.filters import Command
 
-from . import db
+from . import db_async
 from .help_text import telegram_help_message
 from .uptime import current_uptime
 
@@ -57,7 +57,7 @@ async def link(m: types.Message):
     lc_username = parts[1].strip()
     try:
         # The DB layer now owns all link/switch logic so Telegram and Discord stay consistent.
-        ok, msg = db.link_telegram_account(
+        ok, msg = await db_async.link_telegram_account(
             m.from_user.id,
             m.from_user.username or "",
             lc_username,
@@ -79,7 +79,7 @@ async def link(m: types.Message):
 async def unlink(m: types.Message):
     try:
         # Unlink removes only the Telegram side unless this was the user's last remaining platform link.
-        ok, msg = db.unlink_telegram_account(m.from_user.id)
+        ok, msg = await db_async.unlink_telegram_account(m.from_user.id)
     except sqlite3.IntegrityError as exc:
         _log_db_error("/unlink", m, exc)
         return await m.reply(
@@ -100,7 +100,7 @@ async def relink(m: types.Message):
     lc_username = parts[1].strip()
     try:
         # /relink is now focused on repairing a broken Telegram mapping to an existing LC user.
-        ok, msg = db.relink_telegram_account(
+        ok, msg = await db_async.relink_telegram_account(
             m.from_user.id,
             m.from_user.username or "",
             lc_username,
@@ -123,8 +123,8 @@ async def join(m: types.Message):
         return await m.reply("Use /join inside a group.")
 
     try:
-        db.set_chat(m.chat.id, m.chat.title or "")
-        if not db.join_chat(m.chat.id, m.from_user.id):
+        await db_async.set_chat(m.chat.id, m.chat.title or "")
+        if not await db_async.join_chat(m.chat.id, m.from_user.id):
             return await m.reply("Link your LeetCode first with /link leetcode_username.")
     except sqlite3.IntegrityError as exc:
         _log_db_error("/join", m, exc)
@@ -143,7 +143,7 @@ async def leave(m: types.Message):
         return await m.reply("Use /leave in the group you want to leave.")
 
     try:
-        if not db.leave_chat(m.chat.id, m.from_user.id):
+        if not await db_async.leave_chat(m.chat.id, m.from_user.id):
             return await m.reply("Link your LeetCode first with /link leetcode_username.")
     except sqlite3.IntegrityError as exc:
         _log_db_error("/leave", m, exc)
@@ -166,7 +166,7 @@ async def postflag(m: types.Message):
         return await m.reply("Usage: /postonsolve on|off")
 
     try:
-        db.set_chat(
+        await db_async.set_chat(
             m.chat.id,
             m.chat.title or "",
             post_on_solve=1 if arg[0].lower() == "on" else 0,
@@ -20,7 +20,69 @@ if DISCORD_DEV_GUILD_ID:
 DEFAULT_TZ = "America/Chicago"
 DEFAULT_WEIGHTS = (1, 2, 5)
 POLL_SEC = 120
+# Adaptive per-user cadence: idle users back off from the floor towards the ceiling.
+# POLL_IDLE_RATIO is how many seconds of idleness add one second to a user's poll interval.
+POLL_MIN_SEC = int(os.getenv("POLL_MIN_SEC", str(POLL_SEC)))
+POLL_MAX_SEC = int(os.getenv("POLL_MAX_SEC", str(4 * 3600)))
+POLL_IDLE_RATIO = int(os.getenv("POLL_IDLE_RATIO", "96"))
+# Worker-pool poller: workers pull users from a shared queue, the cap bounds in-flight LeetCode work.
+POLL_WORKERS = int(os.getenv("POLL_WORKERS", "4"))
+POLL_CONCURRENCY = int(os.getenv("POLL_CONCURRENCY", "4"))
+# Users per aliased recentAcSubmissionList request, and the pause a worker takes between batches.
+POLL_BATCH_SIZE = int(os.getenv("POLL_BATCH_SIZE", "20"))
+POLL_BATCH_DELAY = float(os.getenv("POLL_BATCH_DELAY", "0.5"))
+# Solve announcements are queued and sent by dispatcher workers, one send at a time per destination
+# by default. Events published while the queue is full are dropped and counted.
+ANNOUNCE_QUEUE_SIZE = int(os.getenv("ANNOUNCE_QUEUE_SIZE", "1000"))
+ANNOUNCE_WORKERS = int(os.getenv("ANNOUNCE_WORKERS", "8"))
+ANNOUNCE_PER_DESTINATION = int(os.getenv("ANNOUNCE_PER_DESTINATION", "1"))
+# Telegram display names are cached per chat member and persisted. Names older than NAME_CACHE_TTL
+# seconds are still shown but refreshed in the background; rows unused for NAME_CACHE_KEEP_DAYS go.
+NAME_CACHE_TTL = int(os.getenv("NAME_CACHE_TTL", str(6 * 3600)))
+NAME_CACHE_SIZE = int(os.getenv("NAME_CACHE_SIZE", "5000"))
+NAME_CACHE_KEEP_DAYS = int(os.getenv("NAME_CACHE_KEEP_DAYS", "30"))
+# Telegram name lookups in flight at once while rendering, across all renders.
+NAME_RESOLVE_CONCURRENCY = int(os.getenv("NAME_RESOLVE_CONCURRENCY", "8"))
+# Scheduled leaderboard and champion posts: destinations posted at once, and how long per-destination
+# checkpoints are kept for resuming interrupted runs.
+SCHEDULE_CONCURRENCY = int(os.getenv("SCHEDULE_CONCURRENCY", "8"))
+SCHEDULE_KEEP_DAYS = int(os.getenv("SCHEDULE_KEEP_DAYS", "35"))
+# The daily leaderboard posts each destination at a fixed slot within this many seconds of 20:00,
+# ranking it just before; 0 posts everything at once.
+DISPATCH_WINDOW_SEC = int(os.getenv("DISPATCH_WINDOW_SEC", "600"))
+# Minutes before the Sunday 23:59 champion post to pre-compute standings and names; at the trigger
+# only destinations that changed since are re-ranked. 0 turns the pre-warm off.
+CHAMPION_PREWARM_MIN = int(os.getenv("CHAMPION_PREWARM_MIN", "5"))
+# Outbound Telegram sendMessage pacing, kept under Telegram's limits of about 30 msgs/s overall,
+# 20 msgs/min per group and 1 msg/s per private chat. Sends rejected with retry_after are retried
+# up to TG_SEND_RETRIES times once the wait is over.
+TG_GLOBAL_RPS = float(os.getenv("TG_GLOBAL_RPS", "25"))
+TG_GROUP_PER_MIN = float(os.getenv("TG_GROUP_PER_MIN", "18"))
+TG_GROUP_BURST = int(os.getenv("TG_GROUP_BURST", "3"))
+TG_PRIVATE_RPS = float(os.getenv("TG_PRIVATE_RPS", "1"))
+TG_SEND_RETRIES = int(os.getenv("TG_SEND_RETRIES", "3"))
+# Outbound Discord messages: one paced FIFO per channel (Discord allows 5 messages per 5s per channel)
+# under a bot-wide cap. Channels that return NotFound/Forbidden are skipped for DISCORD_CHANNEL_MISS_TTL.
+DISCORD_GLOBAL_RPS = float(os.getenv("DISCORD_GLOBAL_RPS", "40"))
+DISCORD_CHANNEL_PER_5S = int(os.getenv("DISCORD_CHANNEL_PER_5S", "5"))
+DISCORD_CHANNEL_MISS_TTL = int(os.getenv("DISCORD_CHANNEL_MISS_TTL", "3600"))
 LC_GRAPHQL = "https://leetcode.com/graphql"
+# Client-side protection for LeetCode: request rate, retry backoff, and the circuit breaker that
+# pauses all LeetCode traffic when too many of the last LC_BREAKER_WINDOW requests failed.
+LC_RPS = float(os.getenv("LC_RPS", "2"))
+LC_BURST = int(os.getenv("LC_BURST", "4"))
+LC_MAX_RETRIES = int(os.getenv("LC_MAX_RETRIES", "3"))
+LC_BACKOFF_BASE = float(os.getenv("LC_BACKOFF_BASE", "1"))
+LC_BACKOFF_MAX = float(os.getenv("LC_BACKOFF_MAX", "30"))
+LC_BREAKER_WINDOW = int(os.getenv("LC_BREAKER_WINDOW", "20"))
+LC_BREAKER_MIN_CALLS = int(os.getenv("LC_BREAKER_MIN_CALLS", "5"))
+LC_BREAKER_RATIO = float(os.getenv("LC_BREAKER_RATIO", "0.5"))
+LC_BREAKER_COOLDOWN = float(os.getenv("LC_BREAKER_COOLDOWN", "120"))
+# Connection pool for the one shared LeetCode HTTP client. HTTP/2 needs the optional `h2` package.
+LC_MAX_CONNECTIONS = int(os.getenv("LC_MAX_CONNECTIONS", "10"))
+LC_MAX_KEEPALIVE = int(os.getenv("LC_MAX_KEEPALIVE", "10"))
+LC_KEEPALIVE_EXPIRY = float(os.getenv("LC_KEEPALIVE_EXPIRY", "60"))
+LC_HTTP2 = os.getenv("LC_HTTP2", "0") == "1"
 
 
 def discord_enabled() -> bool:
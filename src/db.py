@@ -1,29 +1,122 @@
+import json
+import queue
 import sqlite3
+import threading
 import time
 from contextlib import contextmanager
+from datetime import datetime, timezone
 from typing import Optional
 
+from .timeutil import week_window_cst
 
-@contextmanager
-def conn(db_path: str = "bot.db"):
-    c = sqlite3.connect(db_path)
+# Idle connections kept per database file; extra connections opened under load are closed on release.
+POOL_SIZE = 8
+STATEMENT_CACHE_SIZE = 256
+
+# completions.difficulty codes; 0 means the row predates the column and still needs a backfill.
+DIFFICULTY_CODES = {"Easy": 1, "Medium": 2, "Hard": 3}
+_DIFFICULTY_CODE_SQL = "CASE p.difficulty WHEN 'Easy' THEN 1 WHEN 'Medium' THEN 2 WHEN 'Hard' THEN 3 ELSE 0 END"
+
+_pools: dict[str, queue.LifoQueue] = {}
+_pools_lock = threading.Lock()
+
+
+class _Connection(sqlite3.Connection):
+    # Remembers which leaderboard scopes the open transaction changed, so their generations are only
+    # bumped once those changes are committed.
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.touched_scopes: set[tuple] = set()
+
+
+def _connect(db_path: str) -> sqlite3.Connection:
+    # PRAGMAs are per connection, so pooled connections pay for them once.
+    c = sqlite3.connect(
+        db_path,
+        check_same_thread=False,
+        cached_statements=STATEMENT_CACHE_SIZE,
+        factory=_Connection,
+    )
     c.row_factory = sqlite3.Row
     c.execute("PRAGMA journal_mode=WAL;")
     c.execute("PRAGMA foreign_keys=ON;")
     c.execute("PRAGMA busy_timeout=5000;")
+    return c
+
+
+def _pool(db_path: str) -> queue.LifoQueue:
+    with _pools_lock:
+        pool = _pools.get(db_path)
+        if pool is None:
+            pool = _pools[db_path] = queue.LifoQueue(maxsize=POOL_SIZE)
+        return pool
+
+
+def _release(pool: queue.LifoQueue, c: sqlite3.Connection):
+    try:
+        pool.put_nowait(c)
+    except queue.Full:
+        c.close()
+
+
+@contextmanager
+def conn(db_path: str = "bot.db"):
+    pool = _pool(db_path)
+    try:
+        c = pool.get_nowait()
+    except queue.Empty:
+        c = _connect(db_path)
     try:
         yield c
         c.commit()
-    finally:
-        c.close()
+        if c.touched_scopes:
+            _bump_score_generations(c.touched_scopes)
+            c.touched_scopes.clear()
+    except BaseException:
+        # Never hand a connection with a half-done transaction to the next caller.
+        c.touched_scopes.clear()
+        try:
+            c.rollback()
+        except sqlite3.Error:
+            c.close()
+        else:
+            _release(pool, c)
+        raise
+    _release(pool, c)
+
+
+def close_all():
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        while True:
+            try:
+                pool.get_nowait().close()
+            except queue.Empty:
+                break
 
 
 def init(db_path: str = "bot.db"):
     with conn(db_path) as c:
         if _needs_legacy_migration(c):
             _migrate_telegram_primary_schema(c)
+        # Existing databases get their scoreboards and rollups built from solve history the first time.
+        needs_scoreboard = not _table_exists(c, "chat_week_scores")
+        needs_rollups = not _table_exists(c, "daily_rollups")
         _create_current_schema(c)
+        backfilled = _migrate_completion_difficulty(c)
         _ensure_indexes(c)
+        if needs_scoreboard:
+            _rebuild_scoreboards(c)
+        if needs_rollups:
+            _rebuild_daily_rollups(c)
+        # Solves that just got their difficulty start counting; the full rebuilds above already did that.
+        for user_id in backfilled:
+            if not needs_scoreboard:
+                _refresh_member_scores(c, user_id)
+            if not needs_rollups:
+                _rebuild_daily_rollups(c, user_id)
 
 
 def _table_exists(c: sqlite3.Connection, table: str) -> bool:
@@ -115,6 +208,8 @@ def _create_current_schema(c: sqlite3.Connection):
           slug          TEXT NOT NULL,
           solved_at_utc INTEGER NOT NULL,
           is_deleted    INTEGER NOT NULL DEFAULT 0,
+          -- problems.difficulty copied at insert time as 1=Easy, 2=Medium, 3=Hard, so counts skip the join
+          difficulty    INTEGER NOT NULL DEFAULT 0,
           FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
           FOREIGN KEY (slug) REFERENCES problems(slug) ON DELETE CASCADE
         );
@@ -123,6 +218,63 @@ def _create_current_schema(c: sqlite3.Connection):
           lc_username   TEXT PRIMARY KEY,
           last_seen_ts  INTEGER NOT NULL
         );
+
+        -- Per-week difficulty counters for each member, kept in step with completions and memberships.
+        CREATE TABLE IF NOT EXISTS chat_week_scores (
+          chat_id     INTEGER NOT NULL,
+          week_start  INTEGER NOT NULL,
+          user_id     INTEGER NOT NULL,
+          easy        INTEGER NOT NULL DEFAULT 0,
+          medium      INTEGER NOT NULL DEFAULT 0,
+          hard        INTEGER NOT NULL DEFAULT 0,
+          PRIMARY KEY (chat_id, week_start, user_id),
+          FOREIGN KEY (chat_id, user_id) REFERENCES memberships(chat_id, user_id) ON DELETE CASCADE
+        );
+
+        CREATE TABLE IF NOT EXISTS discord_channel_week_scores (
+          guild_id    TEXT NOT NULL,
+          channel_id  TEXT NOT NULL,
+          week_start  INTEGER NOT NULL,
+          user_id     INTEGER NOT NULL,
+          easy        INTEGER NOT NULL DEFAULT 0,
+          medium      INTEGER NOT NULL DEFAULT 0,
+          hard        INTEGER NOT NULL DEFAULT 0,
+          PRIMARY KEY (guild_id, channel_id, week_start, user_id),
+          FOREIGN KEY (guild_id, channel_id, user_id)
+            REFERENCES discord_channel_memberships(guild_id, channel_id, user_id) ON DELETE CASCADE
+        );
+
+        -- Active completions per user and UTC day (day = midnight UTC epoch), for range stats.
+        CREATE TABLE IF NOT EXISTS daily_rollups (
+          user_id  INTEGER NOT NULL,
+          day      INTEGER NOT NULL,
+          easy     INTEGER NOT NULL DEFAULT 0,
+          medium   INTEGER NOT NULL DEFAULT 0,
+          hard     INTEGER NOT NULL DEFAULT 0,
+          PRIMARY KEY (user_id, day),
+          FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        );
+
+        -- Last display name Telegram returned per chat member, so renders skip get_chat_member.
+        CREATE TABLE IF NOT EXISTS telegram_names (
+          chat_id          INTEGER NOT NULL,
+          telegram_user_id INTEGER NOT NULL,
+          display_name     TEXT NOT NULL,
+          resolved_at      INTEGER NOT NULL,
+          PRIMARY KEY (chat_id, telegram_user_id)
+        );
+
+        -- Progress of each scheduled post run, one row per destination, so rerunning the same run
+        -- posts only what is unfinished. run_key is the UTC start of the run's period (the day for
+        -- weekly_leaderboard, the week for weekly_champion). status: pending | sent | failed | skipped.
+        CREATE TABLE IF NOT EXISTS scheduled_posts (
+          job          TEXT NOT NULL,
+          run_key      INTEGER NOT NULL,
+          destination  TEXT NOT NULL,
+          status       TEXT NOT NULL,
+          updated_at   INTEGER NOT NULL,
+          PRIMARY KEY (job, run_key, destination)
+        );
         """
     )
 
@@ -218,6 +370,41 @@ def _migrate_telegram_primary_schema(c: sqlite3.Connection):
         c.execute("PRAGMA foreign_keys=ON;")
 
 
+def _migrate_completion_difficulty(c: sqlite3.Connection) -> set[int]:
+    # Databases from before completions.difficulty get the column, then every row is backfilled
+    # from problems. Rows still at 0 (never backfilled, or whose problem is not in the catalog yet)
+    # are picked up on the next start too. The partial index holds only those rows, so on a
+    # backfilled database the check below costs one empty index lookup rather than a table scan.
+    # Returns the users with active solves that were backfilled; their counters are now stale.
+    added = "difficulty" not in _table_columns(c, "completions")
+    if added:
+        c.execute("ALTER TABLE completions ADD COLUMN difficulty INTEGER NOT NULL DEFAULT 0")
+    c.execute(
+        "CREATE INDEX IF NOT EXISTS idx_completions_unbackfilled ON completions(slug) WHERE difficulty = 0"
+    )
+    if not added and not c.execute("SELECT 1 FROM completions WHERE difficulty = 0 LIMIT 1").fetchone():
+        return set()
+    users = {
+        row["user_id"]
+        for row in c.execute(
+            """
+            SELECT DISTINCT user_id FROM completions
+            WHERE difficulty = 0 AND is_deleted = 0 AND slug IN (SELECT slug FROM problems)
+            """
+        )
+    }
+    c.execute(
+        f"""
+        UPDATE completions
+        SET difficulty = COALESCE(
+          (SELECT {_DIFFICULTY_CODE_SQL} FROM problems p WHERE p.slug = completions.slug), 0
+        )
+        WHERE difficulty = 0
+        """
+    )
+    return users
+
+
 def _ensure_indexes(c: sqlite3.Connection):
     c.execute(
         "CREATE INDEX IF NOT EXISTS idx_memberships_user ON memberships(user_id)"
@@ -234,6 +421,52 @@ def _ensure_indexes(c: sqlite3.Connection):
     c.execute(
         "CREATE INDEX IF NOT EXISTS idx_compl_user_slug_deleted ON completions(user_id, slug, is_deleted)"
     )
+    # Covering indexes over active rows: per-user counts and MAX(solved_at_utc) (get_last_activity),
+    # and window counts across all users, both answered without touching the table.
+    c.execute("DROP INDEX IF EXISTS idx_completions_active_user_time")
+    c.execute("DROP INDEX IF EXISTS idx_completions_time")
+    c.execute(
+        "CREATE INDEX IF NOT EXISTS idx_completions_active_user_time_diff "
+        "ON completions(user_id, solved_at_utc, difficulty) WHERE is_deleted=0"
+    )
+    c.execute(
+        "CREATE INDEX IF NOT EXISTS idx_completions_active_time_user_diff "
+        "ON completions(solved_at_utc, user_id, difficulty) WHERE is_deleted=0"
+    )
+    # Per-problem lookups (re-rated problems, problem deletes).
+    c.execute(
+        "CREATE INDEX IF NOT EXISTS idx_completions_slug ON completions(slug)"
+    )
+    # Membership removals cascade into the score tables by (scope, user).
+    c.execute(
+        "CREATE INDEX IF NOT EXISTS idx_chat_week_scores_member ON chat_week_scores(chat_id, user_id)"
+    )
+    c.execute(
+        "CREATE INDEX IF NOT EXISTS idx_chat_week_scores_user ON chat_week_scores(user_id)"
+    )
+    # Scheduled jobs read one week across every chat and channel at once.
+    c.execute(
+        "CREATE INDEX IF NOT EXISTS idx_chat_week_scores_week ON chat_week_scores(week_start, chat_id)"
+    )
+    c.execute(
+        "CREATE INDEX IF NOT EXISTS idx_discord_channel_week_scores_week "
+        "ON discord_channel_week_scores(week_start, guild_id, channel_id)"
+    )
+    c.execute(
+        "CREATE INDEX IF NOT EXISTS idx_discord_channel_week_scores_member "
+        "ON discord_channel_week_scores(guild_id, channel_id, user_id)"
+    )
+    c.execute(
+        "CREATE INDEX IF NOT EXISTS idx_discord_channel_week_scores_user ON discord_channel_week_scores(user_id)"
+    )
+    # Name cache warm-up loads the newest rows and prunes the oldest.
+    c.execute(
+        "CREATE INDEX IF NOT EXISTS idx_telegram_names_resolved ON telegram_names(resolved_at)"
+    )
+    # Finds runs interrupted before every destination was tried.
+    c.execute(
+        "CREATE INDEX IF NOT EXISTS idx_scheduled_posts_status ON scheduled_posts(status, run_key)"
+    )
 
 
 def get_or_create_user(lc_username: str) -> int:
@@ -306,6 +539,95 @@ def get_telegram_link_for_user(user_id: int):
         ).fetchone()
 
 
+def get_telegram_names(limit: int):
+    # Newest first, so a bounded warm-up keeps the names most recently confirmed.
+    with conn() as c:
+        return c.execute(
+            """
+            SELECT chat_id, telegram_user_id, display_name, resolved_at
+            FROM telegram_names
+            ORDER BY resolved_at DESC
+            LIMIT ?
+            """,
+            (limit,),
+        ).fetchall()
+
+
+def save_telegram_name(chat_id: int, telegram_user_id: int, display_name: str, resolved_at: int):
+    with conn() as c:
+        c.execute(
+            """
+            INSERT INTO telegram_names(chat_id, telegram_user_id, display_name, resolved_at)
+            VALUES(?, ?, ?, ?)
+            ON CONFLICT(chat_id, telegram_user_id)
+            DO UPDATE SET display_name=excluded.display_name, resolved_at=excluded.resolved_at
+            """,
+            (chat_id, telegram_user_id, display_name, resolved_at),
+        )
+
+
+def prune_telegram_names(before: int) -> int:
+    with conn() as c:
+        return c.execute("DELETE FROM telegram_names WHERE resolved_at < ?", (before,)).rowcount
+
+
+def plan_scheduled_posts(job: str, run_key: int, destinations) -> list[str]:
+    # Records the run's destinations as pending, keeping the status of any already recorded by an
+    # earlier attempt, and returns the ones not yet sent.
+    now = int(time.time())
+    with conn() as c:
+        c.executemany(
+            """
+            INSERT INTO scheduled_posts(job, run_key, destination, status, updated_at)
+            VALUES(?, ?, ?, 'pending', ?)
+            ON CONFLICT(job, run_key, destination) DO NOTHING
+            """,
+            [(job, run_key, destination, now) for destination in destinations],
+        )
+        rows = c.execute(
+            """
+            SELECT destination
+            FROM scheduled_posts
+            WHERE job=? AND run_key=? AND status != 'sent'
+            """,
+            (job, run_key),
+        ).fetchall()
+    return [row["destination"] for row in rows]
+
+
+def set_scheduled_post_status(job: str, run_key: int, destination: str, status: str):
+    with conn() as c:
+        c.execute(
+            """
+            UPDATE scheduled_posts
+            SET status=?, updated_at=?
+            WHERE job=? AND run_key=? AND destination=?
+            """,
+            (status, int(time.time()), job, run_key, destination),
+        )
+
+
+def get_interrupted_runs(since: int):
+    # Runs that still have destinations nobody tried: the process stopped partway through.
+    with conn() as c:
+        return c.execute(
+            """
+            SELECT DISTINCT job, run_key
+            FROM scheduled_posts
+            WHERE status='pending' AND run_key >= ?
+            """,
+            (since,),
+        ).fetchall()
+
+
+def prune_scheduled_posts(job: str, before: int) -> int:
+    with conn() as c:
+        return c.execute(
+            "DELETE FROM scheduled_posts WHERE job=? AND run_key < ?",
+            (job, before),
+        ).rowcount
+
+
 def get_discord_link_for_user(user_id: int):
     with conn() as c:
         return c.execute(
@@ -323,16 +645,33 @@ def get_tracked_users():
         return c.execute(
             """
             -- Only poll LC users that still have at least one live platform link.
-            SELECT DISTINCT u.id AS user_id, u.lc_username
+            -- EXISTS probes the unique user_id indexes instead of joining and de-duplicating.
+            SELECT u.id AS user_id, u.lc_username
             FROM users u
-            LEFT JOIN telegram_links tl ON tl.user_id = u.id
-            LEFT JOIN discord_links dl ON dl.user_id = u.id
-            WHERE tl.telegram_user_id IS NOT NULL OR dl.discord_user_id IS NOT NULL
+            WHERE EXISTS (SELECT 1 FROM telegram_links tl WHERE tl.user_id = u.id)
+               OR EXISTS (SELECT 1 FROM discord_links dl WHERE dl.user_id = u.id)
             ORDER BY u.id
             """
         ).fetchall()
 
 
+def get_last_activity() -> dict[int, int]:
+    with conn() as c:
+        rows = c.execute(
+            """
+            -- Newest counted solve per user, falling back to when the user linked.
+            -- The correlated MAX is one seek into idx_completions_active_user_time per user.
+            SELECT u.id AS user_id,
+                   MAX(u.created_at, COALESCE((
+                     SELECT MAX(co.solved_at_utc) FROM completions co
+                     WHERE co.user_id = u.id AND co.is_deleted = 0
+                   ), 0)) AS last_active
+            FROM users u
+            """
+        ).fetchall()
+    return {row["user_id"]: row["last_active"] for row in rows}
+
+
 def ensure_last_seen(lc_username: str, ts: int):
     with conn() as c:
         row = c.execute(
@@ -490,6 +829,8 @@ def link_telegram_account(telegram_user_id: int, tg_username: str, lc_username:
                     "DELETE FROM memberships WHERE user_id=?",
                     (old_user_id,),
                 )
+                # The moved memberships start scoring the target user's solve history.
+                _refresh_member_scores(c, user_id)
             # Point the Telegram account at the final shared user row and refresh the cached username.
             c.execute(
                 """
@@ -585,6 +926,7 @@ def unlink_telegram_account(telegram_user_id: int):
         user_id = link["user_id"]
         lc_username = link["lc_username"]
         # Leaving Telegram should also drop Telegram chat participation for that shared user.
+        c.touched_scopes.update(scope for scope in _member_scopes(c, user_id) if scope[0] == "telegram")
         c.execute("DELETE FROM memberships WHERE user_id=?", (user_id,))
         c.execute("DELETE FROM telegram_links WHERE telegram_user_id=?", (telegram_user_id,))
 
@@ -704,6 +1046,7 @@ def link_discord_account(discord_user_id: str, discord_username: str, lc_usernam
                     "DELETE FROM discord_channel_memberships WHERE user_id=?",
                     (old_user_id,),
                 )
+                _refresh_member_scores(c, user_id)
             # Point the Discord account at the final shared user row and refresh the cached username.
             c.execute(
                 """
@@ -789,6 +1132,7 @@ def unlink_discord_account(discord_user_id: str):
 
         user_id = link["user_id"]
         lc_username = link["lc_username"]
+        c.touched_scopes.update(scope for scope in _member_scopes(c, user_id) if scope[0] == "discord")
         c.execute(
             "DELETE FROM discord_channel_memberships WHERE user_id=?",
             (user_id,),
@@ -876,10 +1220,12 @@ def join_chat(chat_id: int, telegram_user_id: int):
         ).fetchone()
         if not link:
             return False
-        c.execute(
+        cur = c.execute(
             "INSERT OR IGNORE INTO memberships(chat_id, user_id) VALUES(?, ?)",
             (chat_id, link["user_id"]),
         )
+        if cur.rowcount:
+            _refresh_member_scores(c, link["user_id"], {("telegram", chat_id)})
         return True
 
 
@@ -895,6 +1241,7 @@ def leave_chat(chat_id: int, telegram_user_id: int):
             "DELETE FROM memberships WHERE chat_id=? AND user_id=?",
             (chat_id, link["user_id"]),
         )
+        c.touched_scopes.add(("telegram", chat_id))
         return True
 
 
@@ -906,13 +1253,15 @@ def join_discord_channel(guild_id: str, channel_id: str, discord_user_id: str):
         ).fetchone()
         if not link:
             return False
-        c.execute(
+        cur = c.execute(
             """
             INSERT OR IGNORE INTO discord_channel_memberships(guild_id, channel_id, user_id)
             VALUES(?, ?, ?)
             """,
             (guild_id, channel_id, link["user_id"]),
         )
+        if cur.rowcount:
+            _refresh_member_scores(c, link["user_id"], {("discord", guild_id, channel_id)})
         return True
 
 
@@ -931,6 +1280,7 @@ def leave_discord_channel(guild_id: str, channel_id: str, discord_user_id: str):
             """,
             (guild_id, channel_id, link["user_id"]),
         )
+        c.touched_scopes.add(("discord", guild_id, channel_id))
         return True
 
 
@@ -1010,6 +1360,45 @@ def upsert_problem(slug: str, title: str, difficulty: str):
         )
 
 
+def upsert_problems(problems) -> int:
+    # Catalog sweeps are authoritative, so refresh titles and difficulties that LeetCode changed.
+    rows = [(p["slug"], p["title"], p["difficulty"]) for p in problems]
+    with conn() as c:
+        known = {row["slug"]: row["difficulty"] for row in c.execute("SELECT slug, difficulty FROM problems")}
+        changed = [slug for slug, _, difficulty in rows if known.get(slug, difficulty) != difficulty]
+        c.executemany(
+            """
+            INSERT INTO problems(slug, title, difficulty) VALUES(?, ?, ?)
+            ON CONFLICT(slug) DO UPDATE SET title=excluded.title, difficulty=excluded.difficulty
+            """,
+            rows,
+        )
+        # A re-rated problem moves between counters for everyone who has it counted.
+        if changed:
+            c.executemany(
+                f"""
+                UPDATE completions
+                SET difficulty = (SELECT {_DIFFICULTY_CODE_SQL} FROM problems p WHERE p.slug = completions.slug)
+                WHERE slug = ?
+                """,
+                [(slug,) for slug in changed],
+            )
+            marks = ",".join("?" * len(changed))
+            users = c.execute(
+                f"SELECT DISTINCT user_id FROM completions WHERE is_deleted=0 AND slug IN ({marks})",
+                changed,
+            ).fetchall()
+            for row in users:
+                _refresh_member_scores(c, row["user_id"])
+                _rebuild_daily_rollups(c, row["user_id"])
+    return len(rows)
+
+
+def get_all_problems():
+    with conn() as c:
+        return c.execute("SELECT slug, title, difficulty FROM problems").fetchall()
+
+
 def get_problem(slug: str):
     with conn() as c:
         return c.execute(
@@ -1018,97 +1407,476 @@ def get_problem(slug: str):
         ).fetchone()
 
 
-def insert_completion(user_id: int, slug: str, solved_at_utc: int) -> bool:
-    thirty_days = 30 * 86400
+def has_active_completion(user_id: int, slug: str) -> bool:
     with conn() as c:
         row = c.execute(
             """
-            SELECT id, solved_at_utc
-            FROM completions
+            SELECT 1 FROM completions
             WHERE user_id=? AND slug=? AND is_deleted=0
             """,
             (user_id, slug),
         ).fetchone()
+        return row is not None
 
-        if row is None:
+
+def insert_completion(user_id: int, slug: str, solved_at_utc: int) -> bool:
+    with conn() as c:
+        return _insert_completion(c, user_id, slug, solved_at_utc)
+
+
+def _insert_completion(c: sqlite3.Connection, user_id: int, slug: str, solved_at_utc: int) -> bool:
+    thirty_days = 30 * 86400
+    row = c.execute(
+        """
+        SELECT id, solved_at_utc, difficulty
+        FROM completions
+        WHERE user_id=? AND slug=? AND is_deleted=0
+        """,
+        (user_id, slug),
+    ).fetchone()
+
+    if row is None:
+        difficulty = _problem_difficulty(c, slug)
+        c.execute(
+            """
+            INSERT INTO completions(user_id, slug, solved_at_utc, is_deleted, difficulty)
+            VALUES(?, ?, ?, 0, ?)
+            """,
+            (user_id, slug, solved_at_utc, DIFFICULTY_CODES[difficulty]),
+        )
+        _bump_counters(c, user_id, solved_at_utc, difficulty, 1)
+        return True
+
+    if solved_at_utc - row["solved_at_utc"] >= thirty_days:
+        difficulty = _problem_difficulty(c, slug)
+        c.execute("UPDATE completions SET is_deleted=1 WHERE id=?", (row["id"],))
+        # Take back what the old row was counted as; a row still at 0 was never counted.
+        if row["difficulty"]:
+            _bump_counters(c, user_id, row["solved_at_utc"], _DIFFICULTIES[row["difficulty"] - 1], -1)
+        c.execute(
+            """
+            INSERT INTO completions(user_id, slug, solved_at_utc, is_deleted, difficulty)
+            VALUES(?, ?, ?, 0, ?)
+            """,
+            (user_id, slug, solved_at_utc, DIFFICULTY_CODES[difficulty]),
+        )
+        _bump_counters(c, user_id, solved_at_utc, difficulty, 1)
+        return True
+
+    return False
+
+
+def _problem_difficulty(c: sqlite3.Connection, slug: str) -> str:
+    row = c.execute("SELECT difficulty FROM problems WHERE slug=?", (slug,)).fetchone()
+    return row["difficulty"]
+
+
+def _bump_counters(c: sqlite3.Connection, user_id: int, solved_at_utc: int, difficulty: str, delta: int):
+    # Everything derived from active completions moves with them in the same transaction.
+    _bump_week_scores(c, user_id, solved_at_utc, difficulty, delta)
+    _bump_daily_rollup(c, user_id, solved_at_utc, difficulty, delta)
+
+
+def ingest_submissions(user_id: int, lc_username: str, submissions, start: int, end: int):
+    # Apply one poll's new submissions (oldest first, each carrying slug/title/difficulty/solved_at_utc)
+    # in a single transaction: problems, completions and the last_seen cursor commit together.
+    # Returns the inserted completions, each with the week counts as of that solve, plus the final counts.
+    if not submissions:
+        return [], {}
+    with conn() as c:
+        c.executemany(
+            "INSERT OR IGNORE INTO problems(slug, title, difficulty) VALUES(?, ?, ?)",
+            [(sub["slug"], sub["title"], sub["difficulty"]) for sub in submissions],
+        )
+        counts = _user_counts(c, user_id, start, end)
+        inserted = []
+        for sub in submissions:
+            ts = sub["solved_at_utc"]
+            if not _insert_completion(c, user_id, sub["slug"], ts):
+                continue
+            if start <= ts < end:
+                counts[sub["difficulty"]] = counts.get(sub["difficulty"], 0) + 1
+            inserted.append({**sub, "counts": dict(counts)})
+        c.execute(
+            """
+            INSERT INTO last_seen(lc_username, last_seen_ts) VALUES(?, ?)
+            ON CONFLICT(lc_username) DO UPDATE SET last_seen_ts=excluded.last_seen_ts
+            """,
+            (lc_username, max(sub["solved_at_utc"] for sub in submissions)),
+        )
+        return inserted, counts
+
+
+def get_user_counts(user_id: int, start: Optional[int] = None, end: Optional[int] = None):
+    with conn() as c:
+        return _user_counts(c, user_id, start, end)
+
+
+def _user_counts(c: sqlite3.Connection, user_id: int, start: Optional[int] = None, end: Optional[int] = None):
+    # Whole UTC days come from daily_rollups; only the partial days at either edge of the range
+    # (e.g. a Chicago-midnight week boundary) are counted from completions.
+    first_day = None if start is None else -(-start // DAY_SECONDS) * DAY_SECONDS
+    last_day = None if end is None else end // DAY_SECONDS * DAY_SECONDS
+    if first_day is not None and last_day is not None and first_day >= last_day:
+        totals = _raw_user_counts(c, user_id, start, end)
+    else:
+        sql = "SELECT SUM(easy), SUM(medium), SUM(hard) FROM daily_rollups WHERE user_id=?"
+        params: list[int] = [user_id]
+        if first_day is not None:
+            sql += " AND day>=?"
+            params.append(first_day)
+        if last_day is not None:
+            sql += " AND day<?"
+            params.append(last_day)
+        row = c.execute(sql, params).fetchone()
+        totals = [value or 0 for value in row]
+        edges = []
+        if start is not None and start < first_day:
+            edges.append((start, first_day))
+        if end is not None and last_day < end:
+            edges.append((last_day, end))
+        for edge_start, edge_end in edges:
+            totals = [a + b for a, b in zip(totals, _raw_user_counts(c, user_id, edge_start, edge_end))]
+    return {difficulty: count for difficulty, count in zip(_DIFFICULTIES, totals) if count}
+
+
+def _raw_user_counts(c: sqlite3.Connection, user_id: int, start: int, end: int) -> list[int]:
+    row = c.execute(
+        """
+        SELECT SUM(co.difficulty = 1), SUM(co.difficulty = 2), SUM(co.difficulty = 3)
+        FROM completions co
+        WHERE co.user_id=? AND co.is_deleted=0 AND co.solved_at_utc>=? AND co.solved_at_utc<?
+        """,
+        (user_id, start, end),
+    ).fetchone()
+    return [value or 0 for value in row]
+
+
+# Daily rollups: one row of difficulty counters per (user, UTC day), kept in step with active
+# completions so range stats sum a handful of small rows instead of scanning solve history.
+DAY_SECONDS = 86400
+
+
+def _bump_daily_rollup(c: sqlite3.Connection, user_id: int, solved_at_utc: int, difficulty: str, delta: int):
+    day = solved_at_utc // DAY_SECONDS * DAY_SECONDS
+    easy, medium, hard = (delta if difficulty == d else 0 for d in _DIFFICULTIES)
+    c.execute(
+        """
+        INSERT INTO daily_rollups(user_id, day, easy, medium, hard) VALUES(?, ?, ?, ?, ?)
+        ON CONFLICT(user_id, day) DO UPDATE SET
+          easy=easy+excluded.easy, medium=medium+excluded.medium, hard=hard+excluded.hard
+        """,
+        (user_id, day, easy, medium, hard),
+    )
+    if delta < 0:
+        c.execute(
+            "DELETE FROM daily_rollups WHERE user_id=? AND day=? AND easy=0 AND medium=0 AND hard=0",
+            (user_id, day),
+        )
+
+
+def _rebuild_daily_rollups(c: sqlite3.Connection, user_id: Optional[int] = None):
+    where = "" if user_id is None else " AND co.user_id=?"
+    params = () if user_id is None else (user_id,)
+    if user_id is None:
+        c.execute("DELETE FROM daily_rollups")
+    else:
+        c.execute("DELETE FROM daily_rollups WHERE user_id=?", params)
+    c.execute(
+        f"""
+        INSERT INTO daily_rollups(user_id, day, easy, medium, hard)
+        SELECT co.user_id,
+               co.solved_at_utc / {DAY_SECONDS} * {DAY_SECONDS},
+               SUM(co.difficulty = 1),
+               SUM(co.difficulty = 2),
+               SUM(co.difficulty = 3)
+        FROM completions co
+        WHERE co.is_deleted = 0 AND co.difficulty > 0{where}
+        GROUP BY 1, 2
+        """,
+        params,
+    )
+
+
+def rebuild_daily_rollups() -> int:
+    with conn() as c:
+        _rebuild_daily_rollups(c)
+        return c.execute("SELECT COUNT(*) FROM daily_rollups").fetchone()[0]
+
+
+# Weekly scoreboard. chat_week_scores / discord_channel_week_scores hold one row of difficulty
+# counters per (scope, week, member); scope is ("telegram", chat_id) or ("discord", guild_id, channel_id).
+# Completion inserts and soft-deletes bump the counters, membership changes rebuild that member's rows
+# from solve history, and removals cascade through the membership foreign keys.
+_DIFFICULTIES = ("Easy", "Medium", "Hard")
+
+# Committed scoreboard changes per scope in this process; the champion pre-warm compares snapshots
+# to tell which chats and channels changed in between.
+_scores_lock = threading.Lock()
+_scores_generation: dict[tuple, int] = {}
+
+
+def _bump_score_generations(scopes):
+    with _scores_lock:
+        for scope in scopes:
+            _scores_generation[scope] = _scores_generation.get(scope, 0) + 1
+
+
+def score_generations() -> dict[tuple, int]:
+    # Two snapshots differ exactly on the chats and channels whose standings may have changed in between.
+    with _scores_lock:
+        return dict(_scores_generation)
+
+
+def _week_start(ts: int) -> int:
+    return week_window_cst(datetime.fromtimestamp(ts, timezone.utc))[0]
+
+
+def _is_week_window(start: int, end: int) -> bool:
+    return week_window_cst(datetime.fromtimestamp(start, timezone.utc)) == (start, end)
+
+
+def _member_scopes(c: sqlite3.Connection, user_id: int) -> set[tuple]:
+    scopes = {
+        ("telegram", row["chat_id"])
+        for row in c.execute("SELECT chat_id FROM memberships WHERE user_id=?", (user_id,))
+    }
+    scopes.update(
+        ("discord", row["guild_id"], row["channel_id"])
+        for row in c.execute(
+            "SELECT guild_id, channel_id FROM discord_channel_memberships WHERE user_id=?",
+            (user_id,),
+        )
+    )
+    return scopes
+
+
+def _write_week_scores(c: sqlite3.Connection, user_id: int, scopes, week_counts, accumulate: bool):
+    # week_counts maps week_start -> (easy, medium, hard).
+    conflict = "easy=easy+excluded.easy, medium=medium+excluded.medium, hard=hard+excluded.hard"
+    if not accumulate:
+        conflict = "easy=excluded.easy, medium=excluded.medium, hard=excluded.hard"
+    chat_rows = []
+    channel_rows = []
+    for scope in scopes:
+        for week, counts in week_counts.items():
+            if scope[0] == "telegram":
+                chat_rows.append((scope[1], week, user_id, *counts))
+            else:
+                channel_rows.append((scope[1], scope[2], week, user_id, *counts))
+    if chat_rows:
+        c.executemany(
+            f"""
+            INSERT INTO chat_week_scores(chat_id, week_start, user_id, easy, medium, hard)
+            VALUES(?, ?, ?, ?, ?, ?)
+            ON CONFLICT(chat_id, week_start, user_id) DO UPDATE SET {conflict}
+            """,
+            chat_rows,
+        )
+    if channel_rows:
+        c.executemany(
+            f"""
+            INSERT INTO discord_channel_week_scores(guild_id, channel_id, week_start, user_id, easy, medium, hard)
+            VALUES(?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(guild_id, channel_id, week_start, user_id) DO UPDATE SET {conflict}
+            """,
+            channel_rows,
+        )
+    c.touched_scopes.update(scopes)
+
+
+def _bump_week_scores(c: sqlite3.Connection, user_id: int, solved_at_utc: int, difficulty: str, delta: int):
+    counts = tuple(delta if difficulty == d else 0 for d in _DIFFICULTIES)
+    scopes = _member_scopes(c, user_id)
+    if not scopes:
+        return
+    week = _week_start(solved_at_utc)
+    _write_week_scores(c, user_id, scopes, {week: counts}, accumulate=True)
+    if delta < 0:
+        # Keep the tables identical to a rebuild: no rows for weeks that no longer count anything.
+        for table in ("chat_week_scores", "discord_channel_week_scores"):
             c.execute(
-                """
-                INSERT INTO completions(user_id, slug, solved_at_utc, is_deleted)
-                VALUES(?, ?, ?, 0)
+                f"""
+                DELETE FROM {table}
+                WHERE user_id=? AND week_start=? AND easy=0 AND medium=0 AND hard=0
                 """,
-                (user_id, slug, solved_at_utc),
+                (user_id, week),
             )
-            return True
 
-        if solved_at_utc - row["solved_at_utc"] >= thirty_days:
-            c.execute("UPDATE completions SET is_deleted=1 WHERE id=?", (row["id"],))
+
+def _refresh_member_scores(c: sqlite3.Connection, user_id: int, scopes=None):
+    # Rebuild one member's counters from solve history, in the given scopes (all of theirs by default).
+    # Call after the membership rows exist; the score rows reference them.
+    if scopes is None:
+        scopes = _member_scopes(c, user_id)
+    if not scopes:
+        return
+    weeks: dict[int, list[int]] = {}
+    for row in c.execute(
+        """
+        SELECT solved_at_utc, difficulty
+        FROM completions
+        WHERE user_id=? AND is_deleted=0 AND difficulty > 0
+        """,
+        (user_id,),
+    ):
+        counts = weeks.setdefault(_week_start(row["solved_at_utc"]), [0, 0, 0])
+        counts[row["difficulty"] - 1] += 1
+    for scope in scopes:
+        if scope[0] == "telegram":
+            c.execute(
+                "DELETE FROM chat_week_scores WHERE chat_id=? AND user_id=?",
+                (scope[1], user_id),
+            )
+        else:
             c.execute(
                 """
-                INSERT INTO completions(user_id, slug, solved_at_utc, is_deleted)
-                VALUES(?, ?, ?, 0)
+                DELETE FROM discord_channel_week_scores
+                WHERE guild_id=? AND channel_id=? AND user_id=?
                 """,
-                (user_id, slug, solved_at_utc),
+                (scope[1], scope[2], user_id),
             )
-            return True
+    _write_week_scores(c, user_id, scopes, weeks, accumulate=False)
 
-        return False
+
+def _rebuild_scoreboards(c: sqlite3.Connection):
+    c.execute("DELETE FROM chat_week_scores")
+    c.execute("DELETE FROM discord_channel_week_scores")
+    members = c.execute(
+        """
+        SELECT user_id FROM memberships
+        UNION
+        SELECT user_id FROM discord_channel_memberships
+        """
+    ).fetchall()
+    for row in members:
+        _refresh_member_scores(c, row["user_id"])
 
 
-def get_user_counts(user_id: int, start: Optional[int] = None, end: Optional[int] = None):
-    sql = """
-        SELECT p.difficulty, COUNT(*) AS c
-        FROM completions co
-        JOIN problems p ON p.slug = co.slug
-        WHERE co.user_id=? AND co.is_deleted=0
-    """
-    params: list[int] = [user_id]
-    if start is not None:
-        sql += " AND co.solved_at_utc>=?"
-        params.append(start)
-    if end is not None:
-        sql += " AND co.solved_at_utc<?"
-        params.append(end)
-    sql += " GROUP BY p.difficulty"
+def rebuild_scoreboards() -> int:
     with conn() as c:
-        rows = c.execute(sql, params).fetchall()
-    return {row["difficulty"]: row["c"] for row in rows}
+        _rebuild_scoreboards(c)
+        return (
+            c.execute("SELECT COUNT(*) FROM chat_week_scores").fetchone()[0]
+            + c.execute("SELECT COUNT(*) FROM discord_channel_week_scores").fetchone()[0]
+        )
 
 
-def weekly_counts(chat_id: int, start: int, end: int):
+# Ranked standings. Weights go in as one JSON array so any number of destinations share one statement;
+# the CROSS JOIN keeps SQLite driving from that list into each destination's rows by primary key.
+# RANK() uses the leaderboard tie-breakers (total, then Hard, then Medium). Rows past the top `limit`
+# are dropped, except those tied with the leader on total, whom the champion post needs.
+_RANKED_SQL = """
+    WITH weights AS (
+      SELECT {weight_keys},
+             json_extract(value, '$[{n}]') AS we,
+             json_extract(value, '$[{n1}]') AS wm,
+             json_extract(value, '$[{n2}]') AS wh
+      FROM json_each(?)
+    ),
+    counts AS ({counts}),
+    scored AS (
+      SELECT counts.*, easy * we + medium * wm + hard * wh AS total
+      FROM counts JOIN weights USING ({keys})
+    ),
+    ranked AS (
+      SELECT scored.*,
+             RANK() OVER (PARTITION BY {keys} ORDER BY total DESC, hard DESC, medium DESC) AS rank,
+             RANK() OVER (PARTITION BY {keys} ORDER BY total DESC) AS total_rank
+      FROM scored
+    )
+    SELECT {keys}, user_id, easy, medium, hard, total, rank
+    FROM ranked
+    WHERE rank <= ? OR total_rank = 1
+    ORDER BY {keys}, rank, user_id
+"""
+
+_CHAT_COUNTS_WEEK = """
+    SELECT s.chat_id, s.user_id, s.easy, s.medium, s.hard
+    FROM weights w CROSS JOIN chat_week_scores s
+      ON s.chat_id = w.chat_id AND s.week_start = ?
+    WHERE s.easy + s.medium + s.hard > 0
+"""
+_CHAT_COUNTS_RANGE = """
+    SELECT m.chat_id, co.user_id,
+           SUM(co.difficulty = 1) AS easy,
+           SUM(co.difficulty = 2) AS medium,
+           SUM(co.difficulty = 3) AS hard
+    FROM weights w CROSS JOIN memberships m ON m.chat_id = w.chat_id
+    JOIN completions co ON co.user_id = m.user_id
+    WHERE co.is_deleted = 0 AND co.solved_at_utc >= ? AND co.solved_at_utc < ?
+    GROUP BY m.chat_id, co.user_id
+"""
+_CHANNEL_COUNTS_WEEK = """
+    SELECT s.guild_id, s.channel_id, s.user_id, s.easy, s.medium, s.hard
+    FROM weights w CROSS JOIN discord_channel_week_scores s
+      ON s.guild_id = w.guild_id AND s.channel_id = w.channel_id AND s.week_start = ?
+    WHERE s.easy + s.medium + s.hard > 0
+"""
+_CHANNEL_COUNTS_RANGE = """
+    SELECT dcm.guild_id, dcm.channel_id, co.user_id,
+           SUM(co.difficulty = 1) AS easy,
+           SUM(co.difficulty = 2) AS medium,
+           SUM(co.difficulty = 3) AS hard
+    FROM weights w CROSS JOIN discord_channel_memberships dcm
+      ON dcm.guild_id = w.guild_id AND dcm.channel_id = w.channel_id
+    JOIN completions co ON co.user_id = dcm.user_id
+    WHERE co.is_deleted = 0 AND co.solved_at_utc >= ? AND co.solved_at_utc < ?
+    GROUP BY dcm.guild_id, dcm.channel_id, co.user_id
+"""
+
+
+def _ranked(keys: tuple[str, ...], week_counts: str, range_counts: str, weights_by_key: dict, start: int, end: int, limit: int):
+    # Returns {key: [(user_id, easy, medium, hard, total, rank), ...]} in rank order.
+    if not weights_by_key:
+        return {}
+    weight_keys = ", ".join(f"json_extract(value, '$[{i}]') AS {key}" for i, key in enumerate(keys))
+    n = len(keys)
+    if _is_week_window(start, end):
+        counts, window = week_counts, (start,)
+    else:
+        counts, window = range_counts, (start, end)
+    sql = _RANKED_SQL.format(weight_keys=weight_keys, n=n, n1=n + 1, n2=n + 2, counts=counts, keys=", ".join(keys))
+    payload = json.dumps(
+        [[*(key if isinstance(key, tuple) else (key,)), *weights] for key, weights in weights_by_key.items()]
+    )
+    ranked: dict = {}
     with conn() as c:
-        return c.execute(
-            """
-            SELECT co.user_id, p.difficulty, COUNT(*) AS c
-            FROM completions co
-            JOIN problems p ON p.slug = co.slug
-            JOIN memberships m ON m.user_id = co.user_id
-            WHERE m.chat_id = ?
-              AND co.solved_at_utc >= ?
-              AND co.solved_at_utc < ?
-              AND co.is_deleted = 0
-            GROUP BY co.user_id, p.difficulty
-            """,
-            (chat_id, start, end),
-        ).fetchall()
+        for row in c.execute(sql, (payload, *window, limit)):
+            key = row[0] if n == 1 else tuple(row[:n])
+            ranked.setdefault(key, []).append(tuple(row[n:]))
+    return ranked
 
 
-def weekly_counts_discord(guild_id: str, channel_id: str, start: int, end: int):
-    with conn() as c:
-        return c.execute(
-            """
-            SELECT co.user_id, p.difficulty, COUNT(*) AS c
-            FROM completions co
-            JOIN problems p ON p.slug = co.slug
-            JOIN discord_channel_memberships dcm ON dcm.user_id = co.user_id
-            WHERE dcm.guild_id = ?
-              AND dcm.channel_id = ?
-              AND co.solved_at_utc >= ?
-              AND co.solved_at_utc < ?
-              AND co.is_deleted = 0
-            GROUP BY co.user_id, p.difficulty
-            """,
-            (guild_id, channel_id, start, end),
-        ).fetchall()
+def ranked_weekly(chat_id: int, start: int, end: int, weights: tuple[int, int, int], limit: int):
+    return _ranked(
+        ("chat_id",), _CHAT_COUNTS_WEEK, _CHAT_COUNTS_RANGE, {chat_id: weights}, start, end, limit
+    ).get(chat_id, [])
+
+
+def ranked_weekly_discord(guild_id: str, channel_id: str, start: int, end: int, weights: tuple[int, int, int], limit: int):
+    return _ranked(
+        ("guild_id", "channel_id"),
+        _CHANNEL_COUNTS_WEEK,
+        _CHANNEL_COUNTS_RANGE,
+        {(guild_id, channel_id): weights},
+        start,
+        end,
+        limit,
+    ).get((guild_id, channel_id), [])
+
+
+def ranked_weekly_by_chat(start: int, end: int, weights_by_chat: dict[int, tuple[int, int, int]], limit: int):
+    # Every chat's standings in one statement, for the scheduled jobs.
+    return _ranked(("chat_id",), _CHAT_COUNTS_WEEK, _CHAT_COUNTS_RANGE, weights_by_chat, start, end, limit)
+
+
+def ranked_weekly_by_discord_channel(
+    start: int, end: int, weights_by_channel: dict[tuple[str, str], tuple[int, int, int]], limit: int
+):
+    return _ranked(
+        ("guild_id", "channel_id"), _CHANNEL_COUNTS_WEEK, _CHANNEL_COUNTS_RANGE, weights_by_channel, start, end, limit
+    )
 
 
 def get_any_platform_identity(user_id: int):
@@ -1129,3 +1897,28 @@ def get_any_platform_identity(user_id: int):
             (user_id,),
         ).fetchone()
         return row
+
+
+def get_identities(user_ids) -> dict:
+    # user_id -> the get_any_platform_identity() row plus user_id, for every id that exists, in one query.
+    ids = list(dict.fromkeys(user_ids))
+    if not ids:
+        return {}
+    with conn() as c:
+        rows = c.execute(
+            """
+            SELECT
+              u.id AS user_id,
+              u.lc_username,
+              tl.telegram_user_id,
+              tl.tg_username,
+              dl.discord_user_id,
+              dl.discord_username
+            FROM json_each(?) ids
+            JOIN users u ON u.id = ids.value
+            LEFT JOIN telegram_links tl ON tl.user_id = u.id
+            LEFT JOIN discord_links dl ON dl.user_id = u.id
+            """,
+            (json.dumps(ids),),
+        ).fetchall()
+    return {row["user_id"]: row for row in rows}
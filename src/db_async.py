@@ -0,0 +1,99 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from . import db
+
+# Awaitable versions of the db functions used from the event loop. Writes share one thread so they
+# never queue on SQLite's write lock inside the loop; reads run concurrently thanks to WAL.
+READ_THREADS = 4
+
+_reader = ThreadPoolExecutor(max_workers=READ_THREADS, thread_name_prefix="db-read")
+_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-write")
+
+
+async def run_read(fn, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_reader, functools.partial(fn, *args, **kwargs))
+
+
+async def run_write(fn, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_writer, functools.partial(fn, *args, **kwargs))
+
+
+def _read(fn):
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        return await run_read(fn, *args, **kwargs)
+
+    return wrapper
+
+
+def _write(fn):
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        return await run_write(fn, *args, **kwargs)
+
+    return wrapper
+
+
+def shutdown():
+    _reader.shutdown(wait=False, cancel_futures=True)
+    _writer.shutdown(wait=True)
+
+
+# Identity and membership reads
+get_user_by_id = _read(db.get_user_by_id)
+get_user_by_lc = _read(db.get_user_by_lc)
+get_user_by_telegram_id = _read(db.get_user_by_telegram_id)
+get_user_by_discord_id = _read(db.get_user_by_discord_id)
+get_telegram_link_for_user = _read(db.get_telegram_link_for_user)
+get_discord_link_for_user = _read(db.get_discord_link_for_user)
+get_telegram_names = _read(db.get_telegram_names)
+get_any_platform_identity = _read(db.get_any_platform_identity)
+get_identities = _read(db.get_identities)
+get_tracked_users = _read(db.get_tracked_users)
+get_last_activity = _read(db.get_last_activity)
+get_user_chats = _read(db.get_user_chats)
+get_user_discord_channels = _read(db.get_user_discord_channels)
+get_all_telegram_chats = _read(db.get_all_telegram_chats)
+get_all_discord_channels = _read(db.get_all_discord_channels)
+get_chat_scoring = _read(db.get_chat_scoring)
+get_discord_channel_scoring = _read(db.get_discord_channel_scoring)
+
+# Solve and leaderboard reads
+get_problem = _read(db.get_problem)
+has_active_completion = _read(db.has_active_completion)
+get_user_counts = _read(db.get_user_counts)
+ranked_weekly = _read(db.ranked_weekly)
+ranked_weekly_discord = _read(db.ranked_weekly_discord)
+ranked_weekly_by_chat = _read(db.ranked_weekly_by_chat)
+ranked_weekly_by_discord_channel = _read(db.ranked_weekly_by_discord_channel)
+
+# Scheduled post checkpoints
+get_interrupted_runs = _read(db.get_interrupted_runs)
+
+# Writes; get_or_set_last_seen writes when given a timestamp, so it always takes the writer
+get_or_set_last_seen = _write(db.get_or_set_last_seen)
+link_telegram_account = _write(db.link_telegram_account)
+relink_telegram_account = _write(db.relink_telegram_account)
+unlink_telegram_account = _write(db.unlink_telegram_account)
+link_discord_account = _write(db.link_discord_account)
+relink_discord_account = _write(db.relink_discord_account)
+unlink_discord_account = _write(db.unlink_discord_account)
+set_chat = _write(db.set_chat)
+set_discord_channel = _write(db.set_discord_channel)
+join_chat = _write(db.join_chat)
+leave_chat = _write(db.leave_chat)
+join_discord_channel = _write(db.join_discord_channel)
+leave_discord_channel = _write(db.leave_discord_channel)
+upsert_problem = _write(db.upsert_problem)
+upsert_problems = _write(db.upsert_problems)
+insert_completion = _write(db.insert_completion)
+ingest_submissions = _write(db.ingest_submissions)
+save_telegram_name = _write(db.save_telegram_name)
+prune_telegram_names = _write(db.prune_telegram_names)
+plan_scheduled_posts = _write(db.plan_scheduled_posts)
+set_scheduled_post_status = _write(db.set_scheduled_post_status)
+prune_scheduled_posts = _write(db.prune_scheduled_posts)
@@ -4,7 +4,7 @@ import asyncio
 
 import discord
 
-from . import db
+from . import db_async, discord_outbox
 from .config import DISCORD_APP_ID, DISCORD_BOT_TOKEN, DISCORD_DEV_GUILD_ID, discord_enabled
 from .discord_render import champion_message, leaderboard_message, solve_announcement
 
@@ -70,39 +70,34 @@ async def wait_for_discord_ready(discord_task: asyncio.Task | None):
             await asyncio.gather(ready_waiter, return_exceptions=True)
 
 
-async def _resolve_channel(channel_id: str):
-    if discord_client is None:
-        return None
-    cid = int(channel_id)
-    channel = discord_client.get_channel(cid)
-    if channel is None:
-        try:
-            channel = await discord_client.fetch_channel(cid)
-        except Exception as exc:
-            print(f"[Discord] fetch_channel failed channel_id={channel_id} exc={exc}")
-            return None
-    return channel
+def _discord_mention_for(user_id: int, identity) -> str:
+    # `identity` is a get_any_platform_identity() / get_identities() row, or None.
+    if identity and identity["discord_user_id"] is not None:
+        return f"<@{identity['discord_user_id']}>"
+    return discord.utils.escape_markdown(identity["lc_username"] if identity else str(user_id))
 
 
 async def resolve_discord_mention(user_id: int) -> str:
-    link = db.get_discord_link_for_user(user_id)
-    if link:
-        return f"<@{link['discord_user_id']}>"
-    identity = db.get_any_platform_identity(user_id)
-    return discord.utils.escape_markdown(identity["lc_username"] if identity else str(user_id))
+    return _discord_mention_for(user_id, await db_async.get_any_platform_identity(user_id))
 
 
-async def build_discord_rank_lines(scored) -> list[str]:
+async def resolve_discord_mentions(user_ids) -> dict[int, str]:
+    # Mentions need no Discord API call, so one identity read covers the whole board.
+    unique = list(dict.fromkeys(user_ids))
+    identities = await db_async.get_identities(unique)
+    return {user_id: _discord_mention_for(user_id, identities.get(user_id)) for user_id in unique}
+
+
+async def build_discord_rank_lines(scored, mentions=None) -> list[str]:
+    if mentions is None:
+        mentions = await resolve_discord_mentions([entry.user_id for entry in scored])
     lines = []
-    rank = 1
-    for entry in scored[:10]:
-        mention = await resolve_discord_mention(entry["user_id"])
-        counts = entry["counts"]
+    for entry in scored:
+        mention = mentions[entry.user_id]
         lines.append(
-            f"{rank}. {mention} - **{entry['total']}** "
-            f"(E:{counts['Easy']} M:{counts['Medium']} H:{counts['Hard']})"
+            f"{entry.rank}. {mention} - **{entry.total}** "
+            f"(E:{entry.easy} M:{entry.medium} H:{entry.hard})"
         )
-        rank += 1
     return lines
 
 
@@ -114,16 +109,17 @@ async def send_discord_solve_announcement(
     difficulty: str,
     total: int,
     counts: dict[str, int],
-):
+) -> bool:
     if discord_client is None:
-        return
-    channel = await _resolve_channel(channel_id)
+        return False
+    channel = await discord_outbox.resolve_channel(discord_client, channel_id)
     if channel is None:
-        return
+        return False
     mention = await resolve_discord_mention(user_id)
     message = solve_announcement(mention, title, difficulty, total, counts)
     try:
-        await channel.send(
+        await discord_outbox.send(
+            channel,
             message,
             allowed_mentions=discord.AllowedMentions(users=True),
         )
@@ -132,18 +128,21 @@ async def send_discord_solve_announcement(
             f"[Discord] solve announcement failed guild_id={guild_id} "
             f"channel_id={channel_id} exc={exc}"
         )
+        return False
+    return True
 
 
-async def post_discord_leaderboard(guild_id: str, channel_id: str, scoring: str, scored, header: str):
+async def post_discord_leaderboard(guild_id: str, channel_id: str, scoring: str, scored, header: str) -> bool:
     if discord_client is None or not scored:
-        return
-    channel = await _resolve_channel(channel_id)
+        return False
+    channel = await discord_outbox.resolve_channel(discord_client, channel_id)
     if channel is None:
-        return
+        return False
     ranked_lines = await build_discord_rank_lines(scored)
     message = leaderboard_message(header, scoring, ranked_lines)
     try:
-        await channel.send(
+        await discord_outbox.send(
+            channel,
             message,
             allowed_mentions=discord.AllowedMentions(users=True),
         )
@@ -152,21 +151,25 @@ async def post_discord_leaderboard(guild_id: str, channel_id: str, scoring: str,
             f"[Discord] leaderboard send failed guild_id={guild_id} "
             f"channel_id={channel_id} exc={exc}"
         )
+        return False
+    return True
 
 
-async def post_discord_champion(guild_id: str, channel_id: str, scored):
+async def post_discord_champion(guild_id: str, channel_id: str, scored, mentions=None) -> bool:
     if discord_client is None or not scored:
-        return
-    channel = await _resolve_channel(channel_id)
+        return False
+    channel = await discord_outbox.resolve_channel(discord_client, channel_id)
     if channel is None:
-        return
-    ranked_lines = await build_discord_rank_lines(scored)
-    top_total = scored[0]["total"]
-    winners = [entry for entry in scored if entry["total"] == top_total]
-    winner_mentions = [await resolve_discord_mention(entry["user_id"]) for entry in winners]
+        return False
+    if mentions is None:
+        mentions = await resolve_discord_mentions([entry.user_id for entry in scored])
+    ranked_lines = await build_discord_rank_lines(scored, mentions)
+    top_total = scored[0].total
+    winner_mentions = [mentions[entry.user_id] for entry in scored if entry.total == top_total]
     message = champion_message(winner_mentions, top_total, ranked_lines)
     try:
-        await channel.send(
+        await discord_outbox.send(
+            channel,
             message,
             allowed_mentions=discord.AllowedMentions(users=True),
         )
@@ -175,3 +178,5 @@ async def post_discord_champion(guild_id: str, channel_id: str, scored):
             f"[Discord] champion send failed guild_id={guild_id} "
             f"channel_id={channel_id} exc={exc}"
         )
+        return False
+    return True
@@ -4,9 +4,10 @@ from typing import Literal
 import discord
 from discord import app_commands
 
-from . import db
+from . import db_async
 from .help_text import discord_help_message
-from .leaderboard import rank_rows
+from .leaderboard import LEADERBOARD_SIZE, standings
+from .scoring import parse_weights
 from .timeutil import week_window_cst
 from .uptime import current_uptime
 
@@ -48,7 +49,7 @@ def register_discord_commands(tree: app_commands.CommandTree):
     @tree.command(name="link", description="Link your LeetCode account")
     @app_commands.guild_only()
     async def link(interaction: discord.Interaction, leetcode_username: str):
-        ok, msg = db.link_discord_account(
+        ok, msg = await db_async.link_discord_account(
             str(interaction.user.id),
             _discord_username(interaction),
             leetcode_username.strip(),
@@ -58,7 +59,7 @@ def register_discord_commands(tree: app_commands.CommandTree):
     @tree.command(name="relink", description="Relink your Discord account to a LeetCode user")
     @app_commands.guild_only()
     async def relink(interaction: discord.Interaction, leetcode_username: str):
-        ok, msg = db.relink_discord_account(
+        ok, msg = await db_async.relink_discord_account(
             str(interaction.user.id),
             _discord_username(interaction),
             leetcode_username.strip(),
@@ -68,15 +69,15 @@ def register_discord_commands(tree: app_commands.CommandTree):
     @tree.command(name="unlink", description="Unlink your Discord account from LeetCode")
     @app_commands.guild_only()
     async def unlink(interaction: discord.Interaction):
-        ok, msg = db.unlink_discord_account(str(interaction.user.id))
+        ok, msg = await db_async.unlink_discord_account(str(interaction.user.id))
         await _send_response(interaction, msg, ephemeral=True)
 
     @tree.command(name="join", description="Join this channel's leaderboard")
     @app_commands.guild_only()
     async def join(interaction: discord.Interaction):
         guild_id, channel_id = _guild_channel_ids(interaction)
-        db.set_discord_channel(guild_id, channel_id)
-        if not db.join_discord_channel(guild_id, channel_id, str(interaction.user.id)):
+        await db_async.set_discord_channel(guild_id, channel_id)
+        if not await db_async.join_discord_channel(guild_id, channel_id, str(interaction.user.id)):
             return await _send_response(
                 interaction,
                 "Link your LeetCode first with /link.",
@@ -92,7 +93,7 @@ def register_discord_commands(tree: app_commands.CommandTree):
     @app_commands.guild_only()
     async def leave(interaction: discord.Interaction):
         guild_id, channel_id = _guild_channel_ids(interaction)
-        if not db.leave_discord_channel(guild_id, channel_id, str(interaction.user.id)):
+        if not await db_async.leave_discord_channel(guild_id, channel_id, str(interaction.user.id)):
             return await _send_response(
                 interaction,
                 "Link your LeetCode first with /link.",
@@ -104,11 +105,13 @@ def register_discord_commands(tree: app_commands.CommandTree):
     @app_commands.guild_only()
     async def leaderboard(interaction: discord.Interaction):
         guild_id, channel_id = _guild_channel_ids(interaction)
-        db.set_discord_channel(guild_id, channel_id)
-        scoring = db.get_discord_channel_scoring(guild_id, channel_id) or "1,2,5"
+        await db_async.set_discord_channel(guild_id, channel_id)
+        scoring = await db_async.get_discord_channel_scoring(guild_id, channel_id) or "1,2,5"
         start, end = week_window_cst(datetime.now(timezone.utc))
-        rows = db.weekly_counts_discord(guild_id, channel_id, start, end)
-        scored, weights = rank_rows(rows, scoring)
+        weights = parse_weights(scoring)
+        scored = standings(
+            await db_async.ranked_weekly_discord(guild_id, channel_id, start, end, weights, LEADERBOARD_SIZE)
+        )
         if not scored:
             return await _send_response(interaction, "No solves yet this week.")
 
@@ -126,7 +129,7 @@ def register_discord_commands(tree: app_commands.CommandTree):
     @tree.command(name="stats", description="Show your current and lifetime solve counts")
     @app_commands.guild_only()
     async def stats(interaction: discord.Interaction):
-        user = db.get_user_by_discord_id(str(interaction.user.id))
+        user = await db_async.get_user_by_discord_id(str(interaction.user.id))
         if not user:
             return await _send_response(
                 interaction,
@@ -135,8 +138,8 @@ def register_discord_commands(tree: app_commands.CommandTree):
             )
 
         start, end = week_window_cst(datetime.now(timezone.utc))
-        total = db.get_user_counts(user["user_id"])
-        week = db.get_user_counts(user["user_id"], start, end)
+        total = await db_async.get_user_counts(user["user_id"])
+        week = await db_async.get_user_counts(user["user_id"], start, end)
         await _send_response(
             interaction,
             (
@@ -160,7 +163,7 @@ def register_discord_commands(tree: app_commands.CommandTree):
             )
 
         guild_id, channel_id = _guild_channel_ids(interaction)
-        db.set_discord_channel(
+        await db_async.set_discord_channel(
             guild_id,
             channel_id,
             post_on_solve=1 if state == "on" else 0,
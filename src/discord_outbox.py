@@ -0,0 +1,137 @@
+import asyncio
+import time
+
+import discord
+
+from .config import DISCORD_CHANNEL_MISS_TTL, DISCORD_CHANNEL_PER_5S, DISCORD_GLOBAL_RPS
+from .ratelimit import TokenBucket
+
+# Outbound Discord messages. Each channel gets a FIFO lane drained by its own task, paced to the
+# message-create bucket Discord gives every channel (5 per 5s), under one bot-wide bucket. discord.py
+# still honours any 429 it gets; pacing here keeps those rare and keeps each channel's order.
+LANE_IDLE_SEC = 60
+
+# Channels discord.py does not cache (found with fetch_channel), and channels that came back NotFound
+# or Forbidden, with the monotonic time until which they are not tried again.
+_channels: dict[int, object] = {}
+_missing: dict[int, float] = {}
+_global = TokenBucket(DISCORD_GLOBAL_RPS)
+# channel_id -> (queue of (channel, content, kwargs, future), bucket, drain task)
+_lanes: dict[int, tuple[asyncio.Queue, TokenBucket, asyncio.Task]] = {}
+_stats = {"sent": 0, "failed": 0, "fetched": 0, "skipped_missing": 0}
+
+
+def _is_missing(channel_id: int) -> bool:
+    until = _missing.get(channel_id)
+    if until is None:
+        return False
+    if time.monotonic() < until:
+        return True
+    del _missing[channel_id]
+    return False
+
+
+def _mark_missing(channel_id: int):
+    _channels.pop(channel_id, None)
+    _missing[channel_id] = time.monotonic() + DISCORD_CHANNEL_MISS_TTL
+
+
+async def resolve_channel(client, channel_id: str):
+    cid = int(channel_id)
+    # Checked first: a channel we lost access to can still sit in discord.py's cache.
+    if _is_missing(cid):
+        _stats["skipped_missing"] += 1
+        return None
+    channel = client.get_channel(cid) or _channels.get(cid)
+    if channel is not None:
+        return channel
+    try:
+        channel = await client.fetch_channel(cid)
+    except (discord.NotFound, discord.Forbidden) as exc:
+        # Deleted, or we lost access: stop paying a round trip for it on every solve.
+        _mark_missing(cid)
+        print(f"[Discord] fetch_channel failed channel_id={channel_id} exc={exc}; skipping for {DISCORD_CHANNEL_MISS_TTL}s")
+        return None
+    except Exception as exc:
+        # Network trouble or a 5xx; try again next time.
+        print(f"[Discord] fetch_channel failed channel_id={channel_id} exc={exc}")
+        return None
+    _stats["fetched"] += 1
+    _channels[cid] = channel
+    return channel
+
+
+def _settle(future: asyncio.Future, exc: Exception | None = None):
+    if future.done():
+        return
+    if exc is None:
+        future.set_result(None)
+    else:
+        future.set_exception(exc)
+
+
+async def _drain(channel_id: int, queue: asyncio.Queue, bucket: TokenBucket):
+    while True:
+        try:
+            channel, content, kwargs, future = await asyncio.wait_for(queue.get(), LANE_IDLE_SEC)
+        except asyncio.TimeoutError:
+            if queue.empty():
+                del _lanes[channel_id]
+                return
+            continue
+        if future.done():
+            continue
+        if _is_missing(channel_id):
+            _stats["failed"] += 1
+            _settle(future, RuntimeError("channel is unavailable"))
+            continue
+        try:
+            await bucket.acquire()
+            await _global.acquire()
+            await channel.send(content, **kwargs)
+        except (discord.NotFound, discord.Forbidden) as exc:
+            _mark_missing(channel_id)
+            _stats["failed"] += 1
+            _settle(future, exc)
+        except Exception as exc:
+            _stats["failed"] += 1
+            _settle(future, exc)
+        else:
+            _stats["sent"] += 1
+            _settle(future)
+        finally:
+            # Only still pending if this lane was cancelled mid-send (shutdown).
+            if not future.done():
+                future.cancel()
+
+
+async def send(channel, content: str, **kwargs):
+    # Queues behind earlier sends to the same channel; raises whatever channel.send raised.
+    lane = _lanes.get(channel.id)
+    if lane is None:
+        queue = asyncio.Queue()
+        bucket = TokenBucket(DISCORD_CHANNEL_PER_5S / 5, DISCORD_CHANNEL_PER_5S)
+        task = asyncio.create_task(_drain(channel.id, queue, bucket), name=f"discord-lane-{channel.id}")
+        lane = _lanes[channel.id] = (queue, bucket, task)
+    future = asyncio.get_running_loop().create_future()
+    lane[0].put_nowait((channel, content, kwargs, future))
+    await future
+
+
+async def stop():
+    tasks = [task for _, _, task in _lanes.values()]
+    for queue, _, task in _lanes.values():
+        task.cancel()
+        while not queue.empty():
+            queue.get_nowait()[3].cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    _lanes.clear()
+
+
+def status() -> dict:
+    return {
+        "lanes": len(_lanes),
+        "waiting": sum(queue.qsize() for queue, _, _ in _lanes.values()),
+        "missing": len(_missing),
+        **_stats,
+    }
@@ -1,39 +1,25 @@
-from .scoring import parse_weights, score_counts
+# Places shown on a leaderboard; ties at the last place are shown too.
+LEADERBOARD_SIZE = 10
 
 
-def empty_counts() -> dict[str, int]:
-    return {"Easy": 0, "Medium": 0, "Hard": 0}
+class Standing:
+    __slots__ = ("user_id", "easy", "medium", "hard", "total", "rank")
 
+    def __init__(self, user_id: int, easy: int, medium: int, hard: int, total: int, rank: int):
+        self.user_id = user_id
+        self.easy = easy
+        self.medium = medium
+        self.hard = hard
+        self.total = total
+        self.rank = rank
 
-def aggregate_rows(rows) -> dict[int, dict[str, int]]:
-    agg: dict[int, dict[str, int]] = {}
-    for row in rows:
-        user_id = row["user_id"] if hasattr(row, "keys") else row[0]
-        difficulty = row["difficulty"] if hasattr(row, "keys") else row[1]
-        count = row["c"] if hasattr(row, "keys") else row[2]
-        agg.setdefault(user_id, empty_counts())
-        agg[user_id][difficulty] = count
-    return agg
+    def __repr__(self):
+        return (
+            f"Standing(user_id={self.user_id}, easy={self.easy}, medium={self.medium}, "
+            f"hard={self.hard}, total={self.total}, rank={self.rank})"
+        )
 
 
-def rank_rows(rows, scoring: str):
-    weights = parse_weights(scoring)
-    agg = aggregate_rows(rows)
-    scored = []
-    for user_id, counts in agg.items():
-        total = score_counts(counts, weights)
-        scored.append(
-            {
-                "user_id": user_id,
-                "total": total,
-                "counts": counts,
-            }
-        )
-    scored.sort(
-        key=lambda item: (
-            -item["total"],
-            -item["counts"]["Hard"],
-            -item["counts"]["Medium"],
-        )
-    )
-    return scored, weights
+def standings(rows) -> list[Standing]:
+    # Entries for the renderers from db.ranked_weekly* rows: (user_id, easy, medium, hard, total, rank).
+    return [Standing(*row) for row in rows]
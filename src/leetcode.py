@@ -1,6 +1,24 @@
 import httpx, asyncio, random, time
-from typing import List, Dict, Any
-from .config import LC_GRAPHQL
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import List, Dict, Any, Optional
+from .config import (
+    LC_BACKOFF_BASE,
+    LC_BACKOFF_MAX,
+    LC_BREAKER_COOLDOWN,
+    LC_BREAKER_MIN_CALLS,
+    LC_BREAKER_RATIO,
+    LC_BREAKER_WINDOW,
+    LC_BURST,
+    LC_GRAPHQL,
+    LC_HTTP2,
+    LC_KEEPALIVE_EXPIRY,
+    LC_MAX_CONNECTIONS,
+    LC_MAX_KEEPALIVE,
+    LC_MAX_RETRIES,
+    LC_RPS,
+)
+from .ratelimit import TokenBucket
 
 # get recent completions for user
 _recent_q = """
@@ -14,6 +32,15 @@ query recent($username: String!, $limit: Int!) {
 }
 """
 
+# one aliased recentAcSubmissionList per user, e.g. u0: recentAcSubmissionList(username: $u0, ...)
+def _recent_batch_q(n: int) -> str:
+    params = ", ".join(f"$u{i}: String!" for i in range(n))
+    fields = "\n".join(
+        f"  u{i}: recentAcSubmissionList(username: $u{i}, limit: $limit) {{ id title titleSlug timestamp }}"
+        for i in range(n)
+    )
+    return f"query recentBatch({params}, $limit: Int!) {{\n{fields}\n}}"
+
 # get problem details
 _problem_q = """
 query bySlug($slug: String!) {
@@ -21,11 +48,158 @@ query bySlug($slug: String!) {
 }
 """
 
+# page through the full problem list
+_catalog_q = """
+query problemsetQuestionList($categorySlug: String, $limit: Int, $skip: Int, $filters: QuestionListFilterInput) {
+  questionList(categorySlug: $categorySlug, limit: $limit, skip: $skip, filters: $filters) {
+    totalNum
+    data { titleSlug title difficulty }
+  }
+}
+"""
+
+class LCUnavailableError(RuntimeError):
+    """Raised without touching the network while the LeetCode circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """Opens when too many recent requests failed and rejects calls until a cooldown passes."""
+
+    def __init__(self, window:int, min_calls:int, failure_ratio:float, cooldown:float):
+        self.min_calls = min_calls
+        self.failure_ratio = failure_ratio
+        self.cooldown = cooldown
+        self.state = "closed"
+        self.open_until = 0.0
+        self.trips = 0
+        self.last_error = ""
+        self._outcomes: deque = deque(maxlen=window)
+        self._probe_started = None
+
+    def allow(self) -> bool:
+        if self.state == "closed":
+            return True
+        if self.state == "open":
+            if time.monotonic() < self.open_until:
+                return False
+            self.state = "half_open"
+            print("[lc] circuit half-open, sending a probe request")
+        # half-open lets one probe through at a time; its outcome closes or re-opens the breaker.
+        # A probe that never reported back (e.g. cancelled) is replaced after a cooldown.
+        now = time.monotonic()
+        if self._probe_started is not None and now - self._probe_started < self.cooldown:
+            return False
+        self._probe_started = now
+        return True
+
+    def record_success(self):
+        self._outcomes.append(True)
+        if self.state == "half_open":
+            self._probe_started = None
+            self.state = "closed"
+            self._outcomes.clear()
+            print("[lc] circuit closed")
+
+    def record_failure(self, error:str):
+        self._outcomes.append(False)
+        self.last_error = error
+        if self.state == "half_open":
+            self._probe_started = None
+            self._open()
+            return
+        failures = self._outcomes.count(False)
+        if (
+            self.state == "closed"
+            and len(self._outcomes) >= self.min_calls
+            and failures / len(self._outcomes) >= self.failure_ratio
+        ):
+            self._open()
+
+    def open_for(self, seconds:float, error:str):
+        # LeetCode told us how long to stay away; fail fast until then instead of queueing.
+        self.last_error = error
+        self._probe_started = None
+        self._open(max(seconds, self.cooldown))
+
+    def _open(self, seconds:Optional[float]=None):
+        seconds = self.cooldown if seconds is None else seconds
+        self.state = "open"
+        self.open_until = time.monotonic() + seconds
+        self.trips += 1
+        print(f"[lc] circuit open for {seconds:.0f}s last_error={self.last_error}")
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "open_for": max(0.0, self.open_until - time.monotonic()) if self.state == "open" else 0.0,
+            "failures": self._outcomes.count(False),
+            "window": len(self._outcomes),
+            "trips": self.trips,
+            "last_error": self.last_error,
+        }
+
+
+# shared by every LCClient so the rate and the breaker cover all LeetCode traffic in the process
+_limiter = TokenBucket(LC_RPS, LC_BURST)
+_breaker = CircuitBreaker(LC_BREAKER_WINDOW, LC_BREAKER_MIN_CALLS, LC_BREAKER_RATIO, LC_BREAKER_COOLDOWN)
+_retries = 0
+
+
+def breaker_open() -> bool:
+    return _breaker.state == "open" and time.monotonic() < _breaker.open_until
+
+
+def status() -> Dict[str, Any]:
+    return {
+        "breaker": _breaker.status(),
+        "rps": _limiter.rate,
+        "tokens": _limiter.tokens,
+        "retries": _retries,
+    }
+
+
+def _retry_after(r:httpx.Response) -> Optional[float]:
+    # Retry-After is either delta-seconds or an HTTP date
+    value = r.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _backoff(attempt:int) -> float:
+    # full jitter: anywhere between 0 and the capped exponential step
+    return random.uniform(0, min(LC_BACKOFF_MAX, LC_BACKOFF_BASE * 2 ** attempt))
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
 class LCClient:
     def __init__(self):
+        http2 = LC_HTTP2 and _http2_available()
+        if LC_HTTP2 and not http2:
+            print("[lc] LC_HTTP2=1 but the h2 package is not installed, using HTTP/1.1")
         # create one reusable client that acts like a browser
         self.client = httpx.AsyncClient(
             timeout=30,
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=LC_MAX_CONNECTIONS,
+                max_keepalive_connections=LC_MAX_KEEPALIVE,
+                keepalive_expiry=LC_KEEPALIVE_EXPIRY,
+            ),
             headers={
                 "User-Agent": "Mozilla/5.0",
                 "Referer": "https://leetcode.com",
@@ -33,23 +207,124 @@ class LCClient:
             },
         )
 
+    async def _post(self, payload:Dict[str,Any]) -> Dict[str,Any]:
+        # every LeetCode request goes through the breaker, the limiter and the retry loop
+        global _retries
+        for attempt in range(LC_MAX_RETRIES + 1):
+            if not _breaker.allow():
+                raise LCUnavailableError(f"LeetCode circuit open, last_error={_breaker.last_error}")
+            await _limiter.acquire()
+            retry_after = None
+            try:
+                r = await self.client.post(LC_GRAPHQL, json=payload)
+                if r.status_code == 429 or r.status_code >= 500:
+                    retry_after = _retry_after(r)
+                    if retry_after is not None and retry_after > LC_BACKOFF_MAX:
+                        # Pausing the shared limiter this long would park every caller on its lock
+                        # (poll loop, catalog refresh, /debug_recent); open the breaker so they fail fast.
+                        _breaker.open_for(retry_after, f"HTTP {r.status_code} Retry-After {retry_after:.0f}s")
+                    elif retry_after is not None:
+                        _limiter.pause(retry_after)
+                r.raise_for_status()  # throw if http isnt 2xx
+            except httpx.HTTPStatusError as exc:
+                if exc.response.status_code != 429 and exc.response.status_code < 500:
+                    # a plain 4xx is our request's fault, not LeetCode being unhealthy
+                    _breaker.record_success()
+                    raise
+                _breaker.record_failure(f"HTTP {exc.response.status_code}")
+                error = exc
+            except httpx.RequestError as exc:
+                _breaker.record_failure(f"{type(exc).__name__}: {exc}")
+                error = exc
+            else:
+                _breaker.record_success()
+                return r.json()
+
+            if attempt == LC_MAX_RETRIES:
+                raise error
+            _retries += 1
+            # with Retry-After the paused limiter already holds this (and every other) request back
+            if retry_after is None:
+                await asyncio.sleep(_backoff(attempt))
+
     async def recent_ac(self, username:str, limit:int=12) -> List[Dict[str,Any]]:
         # grab recent completions
-        r = await self.client.post(LC_GRAPHQL, json={"query": _recent_q, "variables": {"username": username, "limit": limit}})
-        r.raise_for_status()  # throw if http isnt 2xx
+        body = await self._post({"query": _recent_q, "variables": {"username": username, "limit": limit}})
         # grab list data from the result
-        data = r.json()["data"]["recentAcSubmissionList"] or []
+        data = body["data"]["recentAcSubmissionList"] or []
         # normalize ints
         for d in data:
             d["timestamp"] = int(d["timestamp"])
         return data
 
+    async def recent_ac_batch(self, usernames:List[str], limit:int=12) -> Dict[str, Optional[List[Dict[str,Any]]]]:
+        # grab recent completions for many users in one request; a failed alias maps to None
+        if not usernames:
+            return {}
+        variables: Dict[str, Any] = {f"u{i}": name for i, name in enumerate(usernames)}
+        variables["limit"] = limit
+        body = await self._post({"query": _recent_batch_q(len(usernames)), "variables": variables})
+        data = body.get("data") or {}
+        # graphql reports per-alias failures in errors[].path without failing the whole document
+        failed = {}
+        for err in body.get("errors") or []:
+            path = err.get("path") or []
+            if path:
+                failed[path[0]] = err.get("message", "unknown error")
+
+        out: Dict[str, Optional[List[Dict[str,Any]]]] = {}
+        for i, name in enumerate(usernames):
+            alias = f"u{i}"
+            if alias in failed or (alias not in data and body.get("errors")):
+                print(f"[lc] batch alias failed lc_username={name} error={failed.get(alias, body.get('errors'))}")
+                out[name] = None
+                continue
+            subs = data.get(alias) or []
+            for d in subs:
+                d["timestamp"] = int(d["timestamp"])
+            out[name] = subs
+        return out
+
     # grab problem meta data
     async def problem_meta(self, slug:str) -> Dict[str,str]:
-        r = await self.client.post(LC_GRAPHQL, json={"query": _problem_q, "variables": {"slug": slug}})
-        r.raise_for_status()
-        q = r.json()["data"]["question"]
+        body = await self._post({"query": _problem_q, "variables": {"slug": slug}})
+        q = body["data"]["question"]
         return {"title": q["title"], "difficulty": q["difficulty"]}
 
+    # grab every problem's slug, title and difficulty in pages
+    async def problem_catalog(self, page_size:int=1000) -> List[Dict[str,str]]:
+        problems: List[Dict[str,str]] = []
+        skip = 0
+        while True:
+            variables = {"categorySlug": "", "limit": page_size, "skip": skip, "filters": {}}
+            body = await self._post({"query": _catalog_q, "variables": variables})
+            page = body["data"]["questionList"]
+            rows = page["data"] or []
+            problems.extend(
+                {"slug": q["titleSlug"], "title": q["title"], "difficulty": q["difficulty"]}
+                for q in rows
+            )
+            skip += len(rows)
+            if not rows or skip >= page["totalNum"]:
+                return problems
+
     async def close(self):
         await self.client.aclose()
+
+
+# one process-wide client so the poller and debug commands share warm connections
+_client: Optional[LCClient] = None
+
+
+def get_client() -> LCClient:
+    global _client
+    if _client is None:
+        _client = LCClient()
+    return _client
+
+
+async def close_client():
+    global _client
+    if _client is not None:
+        client, _client = _client, None
+        await client.close()
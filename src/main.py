@@ -1,14 +1,17 @@
 import asyncio
 
-from src import db
+from src import announcer, catalog, db, db_async, discord_outbox, namecache, telegram_outbox
 from src.bot import start_telegram
 from src.config import discord_enabled
 from src.discord_bot import start_discord, wait_for_discord_ready
+from src.leetcode import close_client
 from src.scheduler import start_poller, start_schedulers
 
 
 async def main():
     db.init()
+    catalog.load()
+    namecache.load()
 
     tasks = [asyncio.create_task(start_telegram(), name="telegram-client")]
     if discord_enabled():
@@ -31,9 +34,20 @@ async def main():
         print("[Discord] disabled - set DISCORD_BOT_TOKEN and DISCORD_APP_ID to enable it")
 
     await start_schedulers()
+    announcer.start()
     start_poller()
 
-    await asyncio.gather(*tasks)
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        # Stop the announcement dispatchers and both outboxes, then release the shared LeetCode and
+        # SQLite pools.
+        await announcer.stop()
+        await telegram_outbox.stop()
+        await discord_outbox.stop()
+        await close_client()
+        db_async.shutdown()
+        db.close_all()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,40 @@
+"""Offline maintenance for bot.db. Run from the repo root while the bot is stopped:
+
+    python -m src.maintenance rebuild-rollups
+    python -m src.maintenance rebuild-scoreboards
+"""
+import argparse
+import time
+
+from . import db
+
+
+def rebuild_rollups():
+    started = time.monotonic()
+    rows = db.rebuild_daily_rollups()
+    print(f"[maintenance] rebuilt {rows} daily rollup rows in {time.monotonic() - started:.1f}s")
+
+
+def rebuild_scoreboards():
+    started = time.monotonic()
+    rows = db.rebuild_scoreboards()
+    print(f"[maintenance] rebuilt {rows} weekly scoreboard rows in {time.monotonic() - started:.1f}s")
+
+
+COMMANDS = {
+    "rebuild-rollups": rebuild_rollups,
+    "rebuild-scoreboards": rebuild_scoreboards,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m src.maintenance")
+    parser.add_argument("command", choices=sorted(COMMANDS))
+    args = parser.parse_args(argv)
+    db.init()
+    COMMANDS[args.command]()
+    db.close_all()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+import asyncio
+import time
+from collections import OrderedDict
+
+from . import db, db_async
+from .config import NAME_CACHE_KEEP_DAYS, NAME_CACHE_SIZE, NAME_CACHE_TTL
+
+# (chat_id, telegram_user_id) -> (display_name, resolved_at), least recently used first. Mirrors the
+# telegram_names table so renders normally skip get_chat_member entirely.
+_NAMES: OrderedDict[tuple[int, int], tuple[str, int]] = OrderedDict()
+_refreshing: dict[tuple[int, int], asyncio.Task] = {}
+_stats = {"hits": 0, "stale": 0, "misses": 0, "refresh_failed": 0}
+
+
+def load() -> int:
+    # Forget names nobody has rendered for a long time, then warm up from the newest.
+    db.prune_telegram_names(int(time.time()) - NAME_CACHE_KEEP_DAYS * 86400)
+    _NAMES.clear()
+    for row in reversed(db.get_telegram_names(NAME_CACHE_SIZE)):
+        _NAMES[(row["chat_id"], row["telegram_user_id"])] = (row["display_name"], row["resolved_at"])
+    return len(_NAMES)
+
+
+def _remember(key: tuple[int, int], name: str, resolved_at: int):
+    _NAMES[key] = (name, resolved_at)
+    _NAMES.move_to_end(key)
+    while len(_NAMES) > NAME_CACHE_SIZE:
+        _NAMES.popitem(last=False)
+
+
+async def _fetch(key: tuple[int, int], fetch) -> str:
+    name = await fetch(*key)
+    now = int(time.time())
+    _remember(key, name, now)
+    await db_async.save_telegram_name(*key, name, now)
+    return name
+
+
+async def _refresh(key: tuple[int, int], fetch):
+    try:
+        await _fetch(key, fetch)
+    except Exception as exc:
+        # Keep serving the old name; the next render past the TTL tries again.
+        _stats["refresh_failed"] += 1
+        print(f"[names] refresh failed chat_id={key[0]} telegram_user_id={key[1]} exc={exc}")
+    finally:
+        _refreshing.pop(key, None)
+
+
+async def telegram_name(chat_id: int, telegram_user_id: int, fetch) -> str:
+    # `fetch(chat_id, telegram_user_id)` asks Telegram and returns "@username" or the full name.
+    # Misses await it and raise whatever it raises; names older than NAME_CACHE_TTL are returned
+    # as they are and refreshed in the background.
+    key = (chat_id, telegram_user_id)
+    cached = _NAMES.get(key)
+    if cached is None:
+        _stats["misses"] += 1
+        return await _fetch(key, fetch)
+    _NAMES.move_to_end(key)
+    name, resolved_at = cached
+    if time.time() - resolved_at < NAME_CACHE_TTL:
+        _stats["hits"] += 1
+    else:
+        _stats["stale"] += 1
+        if key not in _refreshing:
+            _refreshing[key] = asyncio.create_task(_refresh(key, fetch), name=f"name-refresh-{chat_id}-{telegram_user_id}")
+    return name
+
+
+def status() -> dict:
+    return {"size": len(_NAMES), "refreshing": len(_refreshing), **_stats}
@@ -1,78 +1,273 @@
 import asyncio
+import heapq
+import math
+import time
 from datetime import datetime, timezone
 
-from . import db
-from .config import POLL_SEC
-from .leetcode import LCClient
+from . import announcer, catalog, db_async
+from .config import (
+    POLL_BATCH_DELAY,
+    POLL_BATCH_SIZE,
+    POLL_CONCURRENCY,
+    POLL_IDLE_RATIO,
+    POLL_MAX_SEC,
+    POLL_MIN_SEC,
+    POLL_WORKERS,
+)
+from .leetcode import breaker_open, get_client
 from .scoring import parse_weights, score_counts
 from .timeutil import week_window_cst
 
-lc = LCClient()
+# Global cap on batches being processed at once, independent of how many workers are running.
+_POLL_LIMIT = asyncio.Semaphore(max(1, POLL_CONCURRENCY))
 
 
-async def poll_loop():
-    await asyncio.sleep(3)
+def poll_interval(last_active: float, now: float) -> float:
+    # Recently active users stay at the floor; every POLL_IDLE_RATIO idle seconds add one second.
+    idle = max(0.0, now - last_active)
+    return min(POLL_MAX_SEC, max(POLL_MIN_SEC, idle / max(1, POLL_IDLE_RATIO)))
+
+
+class PollSchedule:
+    """Min-heap of tracked users keyed by the time each one is next due."""
+
+    def __init__(self):
+        self._heap: list[tuple[float, int]] = []
+        self._due: dict[int, float] = {}
+        self._users: dict[int, object] = {}
+        self._last_active: dict[int, float] = {}
+        self.synced_at = 0.0
+
+    def __len__(self) -> int:
+        return len(self._users)
+
+    def sync(self, users, last_active: dict[int, int], now: float):
+        # New links are due immediately; unlinked users drop out (their heap entries go stale).
+        self.synced_at = now
+        current = {user["user_id"]: user for user in users}
+        for user_id in list(self._users):
+            if user_id not in current:
+                del self._users[user_id]
+                self._due.pop(user_id, None)
+                self._last_active.pop(user_id, None)
+        for user_id, user in current.items():
+            self._users[user_id] = user
+            seen = max(self._last_active.get(user_id, 0), last_active.get(user_id, 0))
+            self._last_active[user_id] = seen
+            if user_id not in self._due:
+                self._push(user_id, now)
+
+    def pop_due(self, now: float) -> list:
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            due_at, user_id = heapq.heappop(self._heap)
+            if self._due.get(user_id) != due_at:
+                continue
+            del self._due[user_id]
+            due.append(self._users[user_id])
+        return due
+
+    def note_activity(self, user_id: int, last_active: float):
+        if user_id in self._users:
+            self._last_active[user_id] = max(self._last_active.get(user_id, 0), last_active)
+
+    def reschedule(self, user_id: int, now: float):
+        if user_id not in self._users:
+            return
+        self._push(user_id, now + poll_interval(self._last_active.get(user_id, 0), now))
+
+    def retry(self, user_id: int, now: float):
+        # After a failed poll: back at the floor interval, not the user's full idle interval.
+        if user_id not in self._users:
+            return
+        self._push(user_id, now + POLL_MIN_SEC)
+
+    def next_due(self) -> float | None:
+        # Drop stale entries left behind by reschedules and unlinks before peeking.
+        while self._heap and self._due.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+        return self._heap[0][0] if self._heap else None
+
+    def _push(self, user_id: int, due_at: float):
+        self._due[user_id] = due_at
+        heapq.heappush(self._heap, (due_at, user_id))
+
+
+_SCHEDULE = PollSchedule()
+
+
+async def ingest_user(user, submissions) -> int | None:
+    user_id = user["user_id"]
+    lc_username = user["lc_username"]
+    cutoff = await db_async.get_or_set_last_seen(lc_username) or 0
+    new_submissions = [sub for sub in submissions if int(sub["timestamp"]) > cutoff]
+    new_submissions.sort(key=lambda sub: sub["timestamp"])
+    print(f"[poll] {lc_username}, cutoff={cutoff}, {len(new_submissions)} new")
+
+    if new_submissions:
+        resolved = []
+        for submission in new_submissions:
+            slug = submission["titleSlug"]
+            meta = await catalog.problem_meta(get_client(), slug)
+            resolved.append(
+                {
+                    "slug": slug,
+                    "title": meta["title"],
+                    "difficulty": meta["difficulty"],
+                    "solved_at_utc": int(submission["timestamp"]),
+                }
+            )
+
+        # Problems, completions and the last_seen cursor for this user commit as one transaction.
+        start, end = week_window_cst(datetime.now(timezone.utc))
+        inserted, _ = await db_async.ingest_submissions(user_id, lc_username, resolved, start, end)
+        if inserted:
+            await announce_solves(user_id, inserted)
+
+    # Any recent AC, counted or not, is the activity signal for the poll schedule.
+    return max((int(sub["timestamp"]) for sub in submissions), default=None)
+
+
+async def announce_solves(user_id: int, inserted):
+    from .bot import send_telegram_solve_announcement
+    from .discord_bot import enabled as discord_enabled
+    from .discord_bot import send_discord_solve_announcement
+
+    chats = [chat for chat in await db_async.get_user_chats(user_id) if chat["post_on_solve"]]
+    channels = []
+    if discord_enabled():
+        channels = [
+            channel
+            for channel in await db_async.get_user_discord_channels(user_id)
+            if channel["post_on_solve"]
+        ]
+    # Hand the sends to the announcer queue so chat-platform latency never stalls polling.
+    for completion in inserted:
+        counts = completion["counts"]
+        for chat in chats:
+            total = score_counts(counts, parse_weights(chat["scoring"]))
+            announcer.publish(
+                ("telegram", chat["chat_id"]),
+                send_telegram_solve_announcement,
+                chat["chat_id"],
+                user_id,
+                completion["title"],
+                completion["difficulty"],
+                total,
+                counts,
+            )
+
+        for channel in channels:
+            total = score_counts(counts, parse_weights(channel["scoring"]))
+            announcer.publish(
+                ("discord", channel["channel_id"]),
+                send_discord_solve_announcement,
+                channel["guild_id"],
+                channel["channel_id"],
+                user_id,
+                completion["title"],
+                completion["difficulty"],
+                total,
+                counts,
+            )
+
+
+async def poll_batch(users) -> set[int]:
+    # One GraphQL round trip for the whole batch, then ingest each user on its own.
+    # Returns the user_ids that were not polled: their alias failed or their ingest raised.
+    results = await get_client().recent_ac_batch([user["lc_username"] for user in users], limit=12)
+    failed = set()
+    for user in users:
+        submissions = results.get(user["lc_username"])
+        if submissions is None:
+            failed.add(user["user_id"])
+            continue
+        try:
+            last_active = await ingest_user(user, submissions)
+        except Exception as exc:
+            # One bad user must not take the rest of the batch down with it.
+            print(
+                f"[poll] error lc_username={user['lc_username']} "
+                f"user_id={user['user_id']} exc={exc}"
+            )
+            failed.add(user["user_id"])
+        else:
+            if last_active is not None:
+                _SCHEDULE.note_activity(user["user_id"], last_active)
+    return failed
+
+
+async def _poll_worker(queue: asyncio.Queue):
     while True:
-        users = db.get_tracked_users()
-        for user in users:
-            user_id = user["user_id"]
-            lc_username = user["lc_username"]
+        batch = []
+        while len(batch) < max(1, POLL_BATCH_SIZE):
+            try:
+                batch.append(queue.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+        if not batch:
+            return
+        async with _POLL_LIMIT:
             try:
-                cutoff = db.get_or_set_last_seen(lc_username) or 0
-                submissions = await lc.recent_ac(lc_username, limit=12)
-                new_submissions = [sub for sub in submissions if int(sub["timestamp"]) > cutoff]
-                new_submissions.sort(key=lambda sub: sub["timestamp"])
-                print(f"[poll] {lc_username}, cutoff={cutoff}, {len(new_submissions)} new")
-
-                for submission in new_submissions:
-                    slug = submission["titleSlug"]
-                    ts = int(submission["timestamp"])
-
-                    if not db.get_problem(slug):
-                        meta = await lc.problem_meta(slug)
-                        db.upsert_problem(slug, meta["title"], meta["difficulty"])
-
-                    inserted = db.insert_completion(user_id, slug, ts)
-                    if inserted:
-                        problem = db.get_problem(slug)
-                        title = problem["title"]
-                        difficulty = problem["difficulty"]
-                        start, end = week_window_cst(datetime.now(timezone.utc))
-                        counts = db.get_user_counts(user_id, start, end)
-
-                        from .bot import send_telegram_solve_announcement
-                        from .discord_bot import send_discord_solve_announcement
-
-                        for chat in db.get_user_chats(user_id):
-                            if not chat["post_on_solve"]:
-                                continue
-                            total = score_counts(counts, parse_weights(chat["scoring"]))
-                            await send_telegram_solve_announcement(
-                                chat["chat_id"],
-                                user_id,
-                                title,
-                                difficulty,
-                                total,
-                                counts,
-                            )
-
-                        for channel in db.get_user_discord_channels(user_id):
-                            if not channel["post_on_solve"]:
-                                continue
-                            total = score_counts(counts, parse_weights(channel["scoring"]))
-                            await send_discord_solve_announcement(
-                                channel["guild_id"],
-                                channel["channel_id"],
-                                user_id,
-                                title,
-                                difficulty,
-                                total,
-                                counts,
-                            )
-
-                    db.get_or_set_last_seen(lc_username, ts)
+                failed = await poll_batch(batch)
             except Exception as exc:
-                print(f"[poll] error lc_username={lc_username} user_id={user_id} exc={exc}")
-            await asyncio.sleep(0.5)
+                names = ",".join(user["lc_username"] for user in batch)
+                print(f"[poll] batch error lc_usernames={names} exc={exc}")
+                # Includes LCUnavailableError when the breaker opened mid-cycle: nobody was polled, so
+                # retry at the floor instead of pushing dormant users back by up to POLL_MAX_SEC.
+                now = time.time()
+                for user in batch:
+                    _SCHEDULE.retry(user["user_id"], now)
+            else:
+                now = time.time()
+                for user in batch:
+                    if user["user_id"] in failed:
+                        _SCHEDULE.retry(user["user_id"], now)
+                    else:
+                        _SCHEDULE.reschedule(user["user_id"], now)
+        await asyncio.sleep(POLL_BATCH_DELAY)
+
+
+async def poll_cycle() -> float:
+    if breaker_open():
+        # Leave due users in the heap; they go out as soon as the breaker lets traffic through.
+        print("[poll] LeetCode circuit open, skipping cycle")
+        return 0.0
+    now = time.time()
+    if now - _SCHEDULE.synced_at >= POLL_MIN_SEC:
+        users = await db_async.get_tracked_users()
+        _SCHEDULE.sync(users, await db_async.get_last_activity(), now)
+    users = _SCHEDULE.pop_due(now)
+    if not users:
+        return 0.0
+    queue: asyncio.Queue = asyncio.Queue()
+    for user in users:
+        queue.put_nowait(user)
+
+    batches = math.ceil(len(users) / max(1, POLL_BATCH_SIZE))
+    started = time.monotonic()
+    workers = [
+        asyncio.create_task(_poll_worker(queue), name=f"poll-worker-{i}")
+        for i in range(min(max(1, POLL_WORKERS), batches))
+    ]
+    await asyncio.gather(*workers)
+    elapsed = time.monotonic() - started
+    print(
+        f"[poll] cycle done users={len(users)}/{len(_SCHEDULE)} workers={len(workers)} "
+        f"wall={elapsed:.1f}s announce_depth={announcer.status()['depth']}"
+    )
+    return elapsed
 
-        await asyncio.sleep(POLL_SEC)
+
+async def poll_loop():
+    await asyncio.sleep(3)
+    while True:
+        try:
+            await poll_cycle()
+        except Exception as exc:
+            print(f"[poll] cycle failed exc={exc}")
+        # Wake for the next due user, but never sleep past the floor so new links are picked up.
+        # The short minimum lets users that come due close together share a batch.
+        next_due = _SCHEDULE.next_due()
+        wait = POLL_MIN_SEC if next_due is None else next_due - time.time()
+        await asyncio.sleep(min(POLL_MIN_SEC, max(5.0, wait)))
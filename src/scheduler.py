@@ -1,49 +1,174 @@
 import asyncio
+import time
+import zlib
 
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
+from functools import partial
 from zoneinfo import ZoneInfo
 
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
 
-from . import db
-from .bot import post_telegram_champion, post_telegram_leaderboard
-from .discord_bot import post_discord_champion, post_discord_leaderboard
-from .leaderboard import rank_rows
+from . import catalog, db, db_async
+from .bot import post_telegram_champion, post_telegram_leaderboard, resolve_telegram_names
+from .config import CHAMPION_PREWARM_MIN, DISPATCH_WINDOW_SEC, SCHEDULE_CONCURRENCY, SCHEDULE_KEEP_DAYS
+from .discord_bot import post_discord_champion, post_discord_leaderboard, resolve_discord_mentions
+from .leaderboard import LEADERBOARD_SIZE, standings
+from .leetcode import get_client
 from .poller import poll_loop
+from .scoring import parse_weights
 from .timeutil import week_window_cst
 
 _SCHEDULER = None
 _POLL_TASK = None
+# (job, run_key) pairs being posted right now, so a resumed run and its cron firing cannot overlap.
+_RUNNING: set[tuple[str, int]] = set()
+# Champion standings and names for the ending week, computed by prewarm_champion().
+_CHAMPION_WARM: dict | None = None
 
 
-async def weekly_leaderboards():
-    start, end = week_window_cst(datetime.now(timezone.utc))
-    print(f"Posting leaderboard snapshot for {start}-{end}")
+async def weekly_standings(start: int, end: int):
+    # One ranking query per platform covers every chat and channel, top places plus ties only.
+    chats = await db_async.get_all_telegram_chats()
+    channels = await db_async.get_all_discord_channels()
+    telegram = await db_async.ranked_weekly_by_chat(
+        start,
+        end,
+        {chat["chat_id"]: parse_weights(chat["scoring"]) for chat in chats},
+        LEADERBOARD_SIZE,
+    )
+    discord = await db_async.ranked_weekly_by_discord_channel(
+        start,
+        end,
+        {(channel["guild_id"], channel["channel_id"]): parse_weights(channel["scoring"]) for channel in channels},
+        LEADERBOARD_SIZE,
+    )
+    return (
+        chats,
+        {key: standings(rows) for key, rows in telegram.items()},
+        channels,
+        {key: standings(rows) for key, rows in discord.items()},
+    )
 
-    for chat in db.get_all_telegram_chats():
-        rows = db.weekly_counts(chat["chat_id"], start, end)
-        if not rows:
-            continue
-        scored, _ = rank_rows(rows, chat["scoring"])
-        await post_telegram_leaderboard(
-            chat["chat_id"],
-            chat["scoring"],
-            scored,
-            "Weekly leaderboard",
+
+def _telegram_destination(chat_id) -> str:
+    return f"tg:{chat_id}"
+
+
+def _discord_destination(guild_id, channel_id) -> str:
+    return f"dc:{guild_id}:{channel_id}"
+
+
+def _day_start(now_utc: datetime) -> int:
+    local = now_utc.astimezone(ZoneInfo("America/Chicago"))
+    return int(local.replace(hour=0, minute=0, second=0, microsecond=0).timestamp())
+
+
+def dispatch_slot(destination: str) -> float:
+    # Seconds into the dispatch window this destination posts at. Hashing the key keeps every
+    # destination on the same slot each day and spreads destinations evenly across the window.
+    return zlib.crc32(destination.encode()) / 2**32 * DISPATCH_WINDOW_SEC
+
+
+async def _post_worker(job: str, run_key: int, queue: asyncio.Queue, posts: dict, results: dict, due):
+    while True:
+        try:
+            destination = queue.get_nowait()
+        except asyncio.QueueEmpty:
+            return
+        if due is not None:
+            await asyncio.sleep(max(0.0, due[destination] - time.monotonic()))
+        try:
+            sent = await posts[destination]()
+        except Exception as exc:
+            print(f"[schedule] {job} post failed destination={destination} exc={exc}")
+            sent = False
+        # None means there was nothing to post (no standings by the time its slot came).
+        status = "skipped" if sent is None else "sent" if sent else "failed"
+        results[status] += 1
+        await db_async.set_scheduled_post_status(job, run_key, destination, status)
+
+
+async def post_run(job: str, run_key: int, posts: dict, slots: dict | None = None):
+    # `posts` maps destination -> coroutine function returning True once the message went out, or
+    # None when there was nothing to post. Each destination is checkpointed in scheduled_posts, so
+    # running the same (job, run_key) again only posts what has not been sent yet. With `slots`
+    # (destination -> seconds after the start), destinations are taken in slot order and none
+    # posts before its slot.
+    if (job, run_key) in _RUNNING:
+        print(f"[schedule] {job} run_key={run_key} already running, skipping")
+        return
+    _RUNNING.add((job, run_key))
+    try:
+        await db_async.prune_scheduled_posts(job, run_key - SCHEDULE_KEEP_DAYS * 86400)
+        todo = await db_async.plan_scheduled_posts(job, run_key, list(posts))
+        queue: asyncio.Queue = asyncio.Queue()
+        results = {"sent": 0, "failed": 0, "skipped": 0}
+        remaining = []
+        for destination in todo:
+            if destination in posts:
+                remaining.append(destination)
+            else:
+                # Recorded by an earlier attempt but gone now (unregistered, or no standings left).
+                results["skipped"] += 1
+                await db_async.set_scheduled_post_status(job, run_key, destination, "skipped")
+        started = time.monotonic()
+        due = None
+        if slots is not None:
+            remaining.sort(key=slots.__getitem__)
+            due = {destination: started + slots[destination] for destination in remaining}
+        for destination in remaining:
+            queue.put_nowait(destination)
+        workers = [
+            asyncio.create_task(
+                _post_worker(job, run_key, queue, posts, results, due), name=f"{job}-worker-{i}"
+            )
+            for i in range(min(max(1, SCHEDULE_CONCURRENCY), queue.qsize()))
+        ]
+        await asyncio.gather(*workers)
+        print(
+            f"[schedule] {job} run_key={run_key} destinations={len(posts)} "
+            f"already_sent={len(posts) - len(remaining)} sent={results['sent']} "
+            f"failed={results['failed']} skipped={results['skipped']} wall={time.monotonic() - started:.1f}s"
         )
+    finally:
+        _RUNNING.discard((job, run_key))
 
-    for channel in db.get_all_discord_channels():
-        rows = db.weekly_counts_discord(
-            channel["guild_id"],
-            channel["channel_id"],
-            start,
-            end,
+
+async def weekly_leaderboards(run_key: int | None = None):
+    # run_key is the local day this snapshot belongs to; resuming an interrupted run passes it back
+    # in so the snapshot keeps that day's week window.
+    if run_key is None:
+        run_key = _day_start(datetime.now(timezone.utc))
+    start, end = week_window_cst(datetime.fromtimestamp(run_key, timezone.utc))
+    print(f"Posting leaderboard snapshot for {start}-{end} over {DISPATCH_WINDOW_SEC}s")
+    chats = await db_async.get_all_telegram_chats()
+    channels = await db_async.get_all_discord_channels()
+
+    # Spread over DISPATCH_WINDOW_SEC: each destination ranks and posts in its own slot, so the DB
+    # reads, name lookups and sends are spread evenly rather than all landing at 20:00.
+    async def post_chat(chat):
+        scored = standings(
+            await db_async.ranked_weekly(chat["chat_id"], start, end, parse_weights(chat["scoring"]), LEADERBOARD_SIZE)
         )
-        if not rows:
-            continue
-        scored, _ = rank_rows(rows, channel["scoring"])
-        await post_discord_leaderboard(
+        if not scored:
+            return None
+        return await post_telegram_leaderboard(chat["chat_id"], chat["scoring"], scored, "Weekly leaderboard")
+
+    async def post_channel(channel):
+        scored = standings(
+            await db_async.ranked_weekly_discord(
+                channel["guild_id"],
+                channel["channel_id"],
+                start,
+                end,
+                parse_weights(channel["scoring"]),
+                LEADERBOARD_SIZE,
+            )
+        )
+        if not scored:
+            return None
+        return await post_discord_leaderboard(
             channel["guild_id"],
             channel["channel_id"],
             channel["scoring"],
@@ -51,35 +176,181 @@ async def weekly_leaderboards():
             "Weekly leaderboard",
         )
 
+    posts = {}
+    for chat in chats:
+        posts[_telegram_destination(chat["chat_id"])] = partial(post_chat, chat)
+    for channel in channels:
+        posts[_discord_destination(channel["guild_id"], channel["channel_id"])] = partial(post_channel, channel)
+    await post_run("weekly_leaderboard", run_key, posts, {destination: dispatch_slot(destination) for destination in posts})
+
+
+def champion_week(now_utc: datetime) -> tuple[int, int]:
+    # The week being crowned is the one a day before now. The champion fires at Sun 23:59 and may run
+    # up to a day late (misfire_grace_time), and the pre-warm runs minutes before it. All of those
+    # land in the week that is ending, never the one that has just begun.
+    return week_window_cst(now_utc - timedelta(days=1))
+
+
+async def _resolve_champion_names(chats, telegram, channels, discord) -> dict:
+    # ("telegram", chat_id) / ("discord", guild_id, channel_id) -> names for that destination's standings.
+    limit = asyncio.Semaphore(max(1, SCHEDULE_CONCURRENCY))
+    names = {}
 
-async def weekly_champion():
-    start, end = week_window_cst(datetime.now(timezone.utc))
+    async def resolve(scope, lookup, user_ids):
+        async with limit:
+            try:
+                names[scope] = await lookup(user_ids)
+            except Exception as exc:
+                # The post resolves them itself at the trigger.
+                print(f"[schedule] champion pre-warm names failed scope={scope} exc={exc}")
+
+    lookups = []
+    for chat in chats:
+        scored = telegram.get(chat["chat_id"])
+        if scored:
+            lookups.append(
+                resolve(
+                    ("telegram", chat["chat_id"]),
+                    partial(resolve_telegram_names, chat["chat_id"]),
+                    [entry.user_id for entry in scored],
+                )
+            )
+    for channel in channels:
+        key = (channel["guild_id"], channel["channel_id"])
+        scored = discord.get(key)
+        if scored:
+            lookups.append(resolve(("discord", *key), resolve_discord_mentions, [entry.user_id for entry in scored]))
+    await asyncio.gather(*lookups)
+    return names
+
+
+async def prewarm_champion():
+    # Runs CHAMPION_PREWARM_MIN minutes before the champion post: computes every destination's
+    # standings and names now, so the trigger only re-ranks what changes in the last minutes.
+    global _CHAMPION_WARM
+    start, end = champion_week(datetime.now(timezone.utc))
+    started = time.monotonic()
+    # Taken before the reads, so a solve committed while they run is treated as changed.
+    generations = db.score_generations()
+    chats, telegram, channels, discord = await weekly_standings(start, end)
+    names = await _resolve_champion_names(chats, telegram, channels, discord)
+    _CHAMPION_WARM = {
+        "start": start,
+        "generations": generations,
+        "chat_scoring": {chat["chat_id"]: chat["scoring"] for chat in chats},
+        "channel_scoring": {(channel["guild_id"], channel["channel_id"]): channel["scoring"] for channel in channels},
+        "telegram": telegram,
+        "discord": discord,
+        "names": names,
+    }
+    print(
+        f"[schedule] champion pre-warmed window={start}-{end} chats={len(telegram)} "
+        f"channels={len(discord)} wall={time.monotonic() - started:.1f}s"
+    )
+
+
+async def champion_standings(start: int, end: int):
+    # Same shape as weekly_standings() plus pre-resolved names. With a pre-warm for this week, only
+    # destinations whose scoreboard, membership or scoring changed since are ranked again.
+    warm = _CHAMPION_WARM
+    if warm is None or warm["start"] != start:
+        return (*await weekly_standings(start, end), {})
+    current = db.score_generations()
+    changed = {scope for scope, generation in current.items() if warm["generations"].get(scope, 0) != generation}
+    chats = await db_async.get_all_telegram_chats()
+    channels = await db_async.get_all_discord_channels()
+    stale_chats = {
+        chat["chat_id"]: parse_weights(chat["scoring"])
+        for chat in chats
+        if ("telegram", chat["chat_id"]) in changed or warm["chat_scoring"].get(chat["chat_id"]) != chat["scoring"]
+    }
+    stale_channels = {
+        (channel["guild_id"], channel["channel_id"]): parse_weights(channel["scoring"])
+        for channel in channels
+        if ("discord", channel["guild_id"], channel["channel_id"]) in changed
+        or warm["channel_scoring"].get((channel["guild_id"], channel["channel_id"])) != channel["scoring"]
+    }
+    telegram = {key: scored for key, scored in warm["telegram"].items() if key not in stale_chats}
+    discord = {key: scored for key, scored in warm["discord"].items() if key not in stale_channels}
+    names = {
+        scope: resolved
+        for scope, resolved in warm["names"].items()
+        if (scope[1] not in stale_chats if scope[0] == "telegram" else scope[1:] not in stale_channels)
+    }
+    if stale_chats:
+        rows = await db_async.ranked_weekly_by_chat(start, end, stale_chats, LEADERBOARD_SIZE)
+        telegram.update({key: standings(ranked) for key, ranked in rows.items()})
+    if stale_channels:
+        rows = await db_async.ranked_weekly_by_discord_channel(start, end, stale_channels, LEADERBOARD_SIZE)
+        discord.update({key: standings(ranked) for key, ranked in rows.items()})
+    print(f"[schedule] champion using pre-warm, re-ranked chats={len(stale_chats)} channels={len(stale_channels)}")
+    return chats, telegram, channels, discord, names
+
+
+async def weekly_champion(run_key: int | None = None):
+    # run_key is the start of the week being crowned, so a resumed run posts that week's results.
+    if run_key is None:
+        start, end = champion_week(datetime.now(timezone.utc))
+    else:
+        start, end = week_window_cst(datetime.fromtimestamp(run_key, timezone.utc))
     print(f"Announcing weekly champion for window {start}-{end}")
+    chats, telegram, channels, discord, names = await champion_standings(start, end)
 
-    for chat in db.get_all_telegram_chats():
-        rows = db.weekly_counts(chat["chat_id"], start, end)
-        if not rows:
-            continue
-        scored, _ = rank_rows(rows, chat["scoring"])
-        await post_telegram_champion(chat["chat_id"], scored)
+    posts = {}
+    for chat in chats:
+        scored = telegram.get(chat["chat_id"])
+        if scored:
+            posts[_telegram_destination(chat["chat_id"])] = partial(
+                post_telegram_champion, chat["chat_id"], scored, names.get(("telegram", chat["chat_id"]))
+            )
+    for channel in channels:
+        scored = discord.get((channel["guild_id"], channel["channel_id"]))
+        if scored:
+            posts[_discord_destination(channel["guild_id"], channel["channel_id"])] = partial(
+                post_discord_champion,
+                channel["guild_id"],
+                channel["channel_id"],
+                scored,
+                names.get(("discord", channel["guild_id"], channel["channel_id"])),
+            )
+    await post_run("weekly_champion", start, posts)
 
-    for channel in db.get_all_discord_channels():
-        rows = db.weekly_counts_discord(
-            channel["guild_id"],
-            channel["channel_id"],
-            start,
-            end,
-        )
-        if not rows:
+
+# job id -> (job function, length of its run period). Runs the process stopped partway through are
+# resumed at startup until a day after their period ends.
+_RESUMABLE = {
+    "weekly_leaderboard": (weekly_leaderboards, 86400),
+    "weekly_champion": (weekly_champion, 7 * 86400),
+}
+
+
+async def resume_interrupted_runs(scheduler):
+    now = time.time()
+    longest = max(period for _, period in _RESUMABLE.values())
+    for row in await db_async.get_interrupted_runs(int(now) - longest - 86400):
+        job, run_key = row["job"], row["run_key"]
+        if job not in _RESUMABLE:
             continue
-        scored, _ = rank_rows(rows, channel["scoring"])
-        await post_discord_champion(
-            channel["guild_id"],
-            channel["channel_id"],
-            scored,
+        func, period = _RESUMABLE[job]
+        if now - run_key > period + 86400:
+            continue
+        print(f"[schedule] resuming interrupted {job} run_key={run_key}")
+        scheduler.add_job(
+            func,
+            kwargs={"run_key": run_key},
+            id=f"{job}_resume_{run_key}",
+            name=f"{job}_resume",
+            replace_existing=True,
         )
 
 
+async def refresh_problem_catalog():
+    try:
+        await catalog.refresh(get_client())
+    except Exception as exc:
+        print(f"[catalog] refresh failed exc={exc}")
+
+
 async def start_schedulers():
     global _SCHEDULER
     now_time = datetime.now(ZoneInfo("America/Chicago"))
@@ -108,6 +379,24 @@ async def start_schedulers():
         timezone=ZoneInfo("America/Chicago"),
     )
     print(f"[setup] weekly champion next: {champ_trig.get_next_fire_time(None, now_time)}")
+    if CHAMPION_PREWARM_MIN > 0:
+        prewarm_at = 23 * 60 + 59 - min(CHAMPION_PREWARM_MIN, 23 * 60)
+        scheduler.add_job(
+            prewarm_champion,
+            CronTrigger(
+                day_of_week="sun",
+                hour=prewarm_at // 60,
+                minute=prewarm_at % 60,
+                timezone=ZoneInfo("America/Chicago"),
+            ),
+            id="champion_prewarm",
+            replace_existing=True,
+            name="champion_prewarm",
+            # Only useful before the champion fires.
+            misfire_grace_time=CHAMPION_PREWARM_MIN * 60,
+            coalesce=True,
+            max_instances=1,
+        )
     scheduler.add_job(
         weekly_champion,
         champ_trig,
@@ -119,8 +408,22 @@ async def start_schedulers():
         max_instances=1,
     )
 
+    # Bulk-load the LeetCode problem list at startup and once a day after that.
+    scheduler.add_job(
+        refresh_problem_catalog,
+        "interval",
+        hours=24,
+        next_run_time=now_time,
+        id="problem_catalog",
+        name="problem_catalog",
+        replace_existing=True,
+        coalesce=True,
+        max_instances=1,
+    )
+
     if not scheduler.running:
         scheduler.start()
+    await resume_interrupted_runs(scheduler)
 
 
 def start_poller():
@@ -0,0 +1,184 @@
+import asyncio
+import heapq
+import itertools
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import SendMessage
+
+from .config import (
+    TG_GLOBAL_RPS,
+    TG_GROUP_BURST,
+    TG_GROUP_PER_MIN,
+    TG_PRIVATE_RPS,
+    TG_SEND_RETRIES,
+)
+from .ratelimit import TokenBucket
+
+# Outbound sendMessage pacing for Telegram. Every send, including handler replies, passes through
+# OutboxMiddleware on the bot's session and waits for admission: one token from the global bucket
+# and one from the chat's bucket. Waiting sends are admitted best priority first, oldest first
+# within a priority, so interactive replies overtake announcements and scheduled posts.
+INTERACTIVE = 0
+ANNOUNCE = 1
+BULK = 2
+
+_priority: ContextVar[int] = ContextVar("telegram_send_priority", default=INTERACTIVE)
+_global = TokenBucket(TG_GLOBAL_RPS)
+_chat_buckets: dict[int, TokenBucket] = {}
+# chat_id -> heap of (priority, seq, future) waiting for admission in that chat.
+_lanes: dict[int, list] = {}
+_ready: asyncio.PriorityQueue | None = None
+_pump: asyncio.Task | None = None
+_seq = itertools.count()
+_stats = {"admitted": 0, "retry_after": 0, "gave_up": 0}
+
+
+@contextmanager
+def priority(level: int):
+    # Sends awaited inside this block, in this task, queue at `level`.
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def _chat_bucket(chat_id: int | str) -> TokenBucket:
+    bucket = _chat_buckets.get(chat_id)
+    if bucket is None:
+        # Negative ids and @usernames are groups and channels (about 20 msgs/min); positive ids are
+        # private chats.
+        if not isinstance(chat_id, int) or chat_id < 0:
+            bucket = TokenBucket(TG_GROUP_PER_MIN / 60, TG_GROUP_BURST)
+        else:
+            bucket = TokenBucket(TG_PRIVATE_RPS)
+        _chat_buckets[chat_id] = bucket
+    return bucket
+
+
+def _forget_idle_buckets():
+    # A full bucket carries no history, so chats with nothing waiting can start fresh later.
+    for chat_id in [c for c, b in _chat_buckets.items() if c not in _lanes and b.tokens >= b.capacity]:
+        del _chat_buckets[chat_id]
+
+
+def _requeue(chat_id: int | str, lane: list):
+    if lane:
+        _ready.put_nowait((lane[0][0], lane[0][1], chat_id))
+    else:
+        del _lanes[chat_id]
+
+
+def _admit_next(entry, loop):
+    level, seq, chat_id = entry
+    lane = _lanes.get(chat_id)
+    # Stale: the lane's head changed after this entry was queued (a better send arrived).
+    if not lane or lane[0][:2] != (level, seq):
+        return None
+    if lane[0][2].done():
+        # The sender gave up (cancelled) while waiting; spend no tokens on it.
+        heapq.heappop(lane)
+        _requeue(chat_id, lane)
+        return None
+    delay = _chat_bucket(chat_id).delay()
+    if delay > 0:
+        # This chat is at its limit; come back for it later and serve other chats meanwhile.
+        loop.call_later(delay, _ready.put_nowait, entry)
+        return None
+    return chat_id
+
+
+async def _admit():
+    loop = asyncio.get_running_loop()
+    while True:
+        entry = await _ready.get()
+        try:
+            chat_id = _admit_next(entry, loop)
+            if chat_id is None:
+                continue
+            await _global.acquire()
+            # Senders can be cancelled while the global token is awaited; admit whoever now heads the lane.
+            lane = _lanes.get(chat_id)
+            while lane and lane[0][2].done():
+                heapq.heappop(lane)
+            if not lane:
+                _lanes.pop(chat_id, None)
+                continue
+            _chat_bucket(chat_id).try_acquire()
+            _, _, future = heapq.heappop(lane)
+            future.set_result(None)
+            _stats["admitted"] += 1
+            _requeue(chat_id, lane)
+            if _stats["admitted"] % 1000 == 0:
+                _forget_idle_buckets()
+        except Exception as exc:
+            # One bad entry must not stop every later send from being admitted.
+            print(f"[outbox] admit failed entry={entry} exc={exc!r}")
+
+
+def _start():
+    global _ready, _pump
+    if _pump is None or _pump.done():
+        if _ready is None:
+            _ready = asyncio.PriorityQueue()
+        _pump = asyncio.create_task(_admit(), name="telegram-outbox")
+
+
+async def _wait_turn(chat_id: int | str, level: int, seq: int):
+    _start()
+    future = asyncio.get_running_loop().create_future()
+    lane = _lanes.setdefault(chat_id, [])
+    heapq.heappush(lane, (level, seq, future))
+    if lane[0][2] is future:
+        _ready.put_nowait((level, seq, chat_id))
+    await future
+
+
+class OutboxMiddleware(BaseRequestMiddleware):
+    async def __call__(self, make_request, bot, method):
+        if not isinstance(method, SendMessage):
+            return await make_request(bot, method)
+        level = _priority.get()
+        # A retried send keeps its original place in line.
+        seq = next(_seq)
+        attempt = 0
+        while True:
+            await _wait_turn(method.chat_id, level, seq)
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as exc:
+                _stats["retry_after"] += 1
+                # Nothing else goes to this chat until Telegram says so, this send included.
+                _chat_bucket(method.chat_id).pause(exc.retry_after)
+                attempt += 1
+                if attempt > TG_SEND_RETRIES:
+                    _stats["gave_up"] += 1
+                    raise
+                print(
+                    f"[outbox] retry_after={exc.retry_after}s chat_id={method.chat_id} "
+                    f"attempt={attempt}/{TG_SEND_RETRIES}"
+                )
+
+
+async def stop():
+    global _pump, _ready
+    if _pump is not None:
+        _pump.cancel()
+        await asyncio.gather(_pump, return_exceptions=True)
+    for lane in _lanes.values():
+        for _, _, future in lane:
+            future.cancel()
+    _lanes.clear()
+    _pump = None
+    _ready = None
+
+
+def status() -> dict:
+    return {
+        "waiting": sum(len(lane) for lane in _lanes.values()),
+        "chats": len(_chat_buckets),
+        **_stats,
+    }